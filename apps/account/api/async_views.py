@@ -0,0 +1,23 @@
+from apps.account.models import User
+from config.async_views import AsyncAPIView
+
+from .serializers import AdminSerializer, BarberUserSerializer, UserSerializer
+
+
+class AsyncProfileView(AsyncAPIView):
+    """ASGI version of GET on UserOrBarberRetrieveUpdateAPIView."""
+    login_required = True
+    serializer_classes = {
+        'barber': BarberUserSerializer,
+        'admin': AdminSerializer,
+    }
+
+    async def get(self, request):
+        # request.user only has the cached fields; load what the serializer reads up front,
+        # as a deferred field or lazy relation would query synchronously.
+        users = User.objects.select_related('company')
+        if request.user.role == 'admin':
+            users = users.prefetch_related('groups', 'user_permissions')
+        user = await users.aget(pk=request.user.pk)
+        serializer = self.serializer_classes.get(user.role, UserSerializer)(user, context={'request': request})
+        return self.render(serializer.data)
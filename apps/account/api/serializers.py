@@ -1,8 +1,27 @@
+from django.core.files.storage import default_storage
 from rest_framework import serializers
 
+from apps.account.avatars import current_variants
 from apps.account.models import User, Company
 
 
+class AvatarThumbnailsField(serializers.Field):
+    """URLs of the resized avatar variants, {} until the background job has produced them."""
+
+    def __init__(self, **kwargs):
+        kwargs['source'] = '*'
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = {}
+        for name, path in current_variants(value).items():
+            url = default_storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request is not None else url
+        return urls
+
+
 class AdminSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -10,6 +29,8 @@ class AdminSerializer(serializers.ModelSerializer):
 
 
 class UserSerializer(serializers.ModelSerializer):
+    avatar_thumbnails = AvatarThumbnailsField()
+
     class Meta:
         model = User
         fields = [
@@ -19,7 +40,8 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'phone_number',
             'role',
-            'avatar'
+            'avatar',
+            'avatar_thumbnails'
         ]
 
 
@@ -66,6 +88,7 @@ class UserCreateUpdateSerializer(serializers.ModelSerializer):
 
 class BarberUserSerializer(serializers.ModelSerializer):
     company = serializers.CharField(source='company.name', read_only=True)
+    avatar_thumbnails = AvatarThumbnailsField()
 
     class Meta:
         model = User
@@ -81,7 +104,8 @@ class BarberUserSerializer(serializers.ModelSerializer):
             'end',
             'break_start',
             'break_end',
-            'company'
+            'company',
+            'avatar_thumbnails'
         ]
 
 
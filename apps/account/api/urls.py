@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path("Register/", views.RegisterUserAPIView.as_view(), name="Register"),
@@ -8,4 +8,5 @@ urlpatterns = [
     path("Companies/", views.CompanyListAPIView.as_view(), name="GetCompany"),
     path("Company/", views.CompanyCreateAPIView.as_view(), name="CreateCompany"),
     path("Company/<int:pk>/", views.CompanyRetrieveUpdateAPIView.as_view(), name="GetOrUpdateCompany"),
+    path("Async/Profile/", async_views.AsyncProfileView.as_view(), name="AsyncGetProfile"),
 ]
@@ -1,8 +1,11 @@
+from django.db.models import Prefetch
 from rest_framework import generics, status, permissions
 from rest_framework.parsers import MultiPartParser, FileUploadParser
 from rest_framework.response import Response
 
 from apps.account.models import User, Company
+from config.conditional import ConditionalMixin
+from config.pagination import KeysetPagination
 from .serializers import (
     UserCreateUpdateSerializer, BarberUserSerializer,
     BarberUserCreateUpdateSerializer, UserSerializer,
@@ -24,9 +27,11 @@ class RegisterUserAPIView(generics.CreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class BarberUserListCreateAPIView(generics.ListCreateAPIView):
+class BarberUserListCreateAPIView(ConditionalMixin, generics.ListCreateAPIView):
     serializer_class = BarberUserSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = KeysetPagination
+    last_modified_fields = ('updated_at', 'company__updated_at')
 
     def get_serializer_class(self):
         if self.request.method == 'POST':
@@ -34,7 +39,7 @@ class BarberUserListCreateAPIView(generics.ListCreateAPIView):
         return BarberUserSerializer
 
     def get_queryset(self):
-        return User.objects.all().order_by('-id')
+        return User.objects.select_related('company').order_by('-id')
 
     def create(self, request, *args, **kwargs):
         serializer = BarberUserCreateUpdateSerializer(data=request.data)
@@ -44,10 +49,11 @@ class BarberUserListCreateAPIView(generics.ListCreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class UserOrBarberRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
+class UserOrBarberRetrieveUpdateAPIView(ConditionalMixin, generics.RetrieveUpdateAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    last_modified_fields = ('updated_at', 'company__updated_at')
 
     def get_serializer_class(self):
         if self.request.method == 'PUT' or self.request.method == 'PATCH':
@@ -62,8 +68,12 @@ class UserOrBarberRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
             return AdminSerializer
         return UserSerializer
 
+    def get_validator_queryset(self):
+        return User.objects.filter(pk=self.request.user.pk)
+
     def get_object(self):
-        return self.request.user
+        # request.user may come from the authentication cache, with only a few fields loaded.
+        return User.objects.select_related('company').get(pk=self.request.user.pk)
 
     def update(self, request, *args, **kwargs):
         serializer = self.get_serializer(self.get_object(), data=request.data, partial=True)
@@ -73,12 +83,16 @@ class UserOrBarberRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CompanyListAPIView(generics.ListAPIView):
+class CompanyListAPIView(ConditionalMixin, generics.ListAPIView):
     serializer_class = CompanySerializer
     permission_classes = (permissions.IsAuthenticated,)
+    last_modified_fields = ('updated_at', 'employees__updated_at')
 
     def get_queryset(self):
-        return Company.objects.all()
+        # The serializer only lists employee ids, so fetch nothing else for them.
+        return Company.objects.prefetch_related(
+            Prefetch('employees', queryset=User.objects.only('id', 'company_id'))
+        )
 
 
 class CompanyCreateAPIView(generics.CreateAPIView):
@@ -93,10 +107,13 @@ class CompanyCreateAPIView(generics.CreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CompanyRetrieveUpdateAPIView(generics.RetrieveUpdateAPIView):
-    queryset = Company.objects.all()
+class CompanyRetrieveUpdateAPIView(ConditionalMixin, generics.RetrieveUpdateAPIView):
+    queryset = Company.objects.prefetch_related(
+        Prefetch('employees', queryset=User.objects.select_related('company'))
+    )
     serializer_class = CompanyCreateSerializer
     permission_classes = (permissions.IsAdminUser,)
+    last_modified_fields = ('updated_at', 'employees__updated_at')
 
     def update(self, request, *args, **kwargs):
         serializer = self.get_serializer(self.get_object(), data=request.data, partial=True)
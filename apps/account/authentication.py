@@ -0,0 +1,116 @@
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+# What is cached of a user: the fields authentication and permission checks read. The rest,
+# the password hash included, is loaded from the database if something asks for it.
+CACHED_FIELDS = ('id', 'username', 'role', 'company_id', 'is_active', 'is_staff', 'is_superuser')
+
+
+def get_cache():
+    return caches[getattr(settings, 'AUTH_USER_CACHE_ALIAS', 'default')]
+
+
+def user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_users(user_ids):
+    get_cache().delete_many([user_cache_key(user_id) for user_id in user_ids])
+
+
+def invalidate_users_on_commit(user_ids, using=None):
+    """invalidate_users once the transaction on ``using`` commits.
+
+    Dropping the entries earlier would let a concurrent request cache the committed rows
+    again, e.g. a user the admin is deactivating as still active.
+    """
+    transaction.on_commit(partial(invalidate_users, list(user_ids)), using=using)
+
+
+def cache_entry(user):
+    entry = {field: getattr(user, field) for field in CACHED_FIELDS}
+    # Tokens carry this digest of the hash, not the hash itself.
+    entry['password_md5'] = get_md5_hash_password(user.password) if api_settings.CHECK_REVOKE_TOKEN else None
+    return entry
+
+
+def user_from_entry(model, entry):
+    """A ``model`` instance with only the cached fields loaded; the others are deferred."""
+    fields = [field.attname for field in model._meta.concrete_fields if field.attname in entry]
+    user = model.from_db(DEFAULT_DB_ALIAS, fields, [entry[field] for field in fields])
+    user.password_md5 = entry['password_md5']
+    return user
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that resolves the token's user from a short-TTL cache instead of the database.
+
+    Only CACHED_FIELDS are kept, so ``request.user`` has the rest deferred. Entries are
+    dropped when the user is saved or deleted (see apps.account.signals) and when a
+    queryset update() touches one of those fields (see apps.account.models.UserQuerySet).
+    With a per-process cache other workers may keep a stale entry for up to
+    AUTH_USER_CACHE_TIMEOUT seconds; use a shared cache backend when that matters.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        cache = get_cache()
+        key = user_cache_key(user_id)
+        entry = cache.get(key)
+        if entry is None:
+            try:
+                user = self.user_model.objects.get(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = cache_entry(user)
+            cache.set(key, entry, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+        return self.check_user(user_from_entry(self.user_model, entry), validated_token)
+
+    async def aauthenticate(self, request):
+        """``authenticate`` for async views: token parsing is pure CPU, the user comes from the async cache/ORM."""
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        cache = get_cache()
+        key = user_cache_key(user_id)
+        entry = await cache.aget(key)
+        if entry is None:
+            try:
+                user = await self.user_model.objects.aget(**{api_settings.USER_ID_FIELD: user_id})
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_("User not found"), code="user_not_found")
+            entry = cache_entry(user)
+            await cache.aset(key, entry, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 60))
+        return self.check_user(user_from_entry(self.user_model, entry), validated_token)
+
+    @staticmethod
+    def check_user(user, validated_token):
+        # The checks of JWTAuthentication.get_user that need no query.
+        if not user.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and \
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != user.password_md5:
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user
@@ -0,0 +1,111 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'SYNC': False,
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'VARIANTS': {'thumb': 64, 'small': 160, 'medium': 320},
+}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_option(name):
+    return getattr(settings, 'AVATAR_PROCESSING', {}).get(name, DEFAULTS[name])
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=get_option('WORKERS'), thread_name_prefix='avatars')
+        return _executor
+
+
+def needs_processing(user):
+    return bool(user.avatar) and user.avatar_variants.get('source') != user.avatar.name
+
+
+def current_variants(user):
+    """Variant paths of ``user``, or {} while the current avatar has not been processed yet."""
+    if not needs_processing(user) and user.avatar:
+        return {name: path for name, path in user.avatar_variants.items() if name != 'source'}
+    return {}
+
+
+def schedule(user_id):
+    """Process the avatar of ``user_id`` once the current transaction commits, off the request thread."""
+    transaction.on_commit(lambda: submit(user_id))
+
+
+def submit(user_id):
+    if get_option('SYNC'):
+        process_avatar(user_id)
+    else:
+        get_executor().submit(run_job, user_id)
+
+
+def run_job(user_id):
+    try:
+        process_avatar(user_id)
+    except Exception:
+        logger.exception('Processing the avatar of user %s failed', user_id)
+    finally:
+        # Worker threads outlive requests, so nothing else closes their connection.
+        connection.close()
+
+
+def process_avatar(user_id, force=False):
+    """Write the variants of the user's avatar; ``force`` regenerates them when they are current."""
+    # Pillow is only needed here; importing it lazily keeps it out of worker startup.
+    from PIL import Image, ImageOps
+
+    from apps.account.models import User
+
+    user = User.objects.filter(pk=user_id).only('id', 'avatar', 'avatar_variants').first()
+    if user is None or not user.avatar or not (force or needs_processing(user)):
+        return
+
+    image_format, quality = get_option('FORMAT'), get_option('QUALITY')
+    source = user.avatar.name
+    with user.avatar.open('rb') as file:
+        image = ImageOps.exif_transpose(Image.open(file))
+        # Keep transparency (an alpha channel, or a transparent palette entry) unless the format cannot hold it.
+        transparent = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if transparent and image_format != 'JPEG' else 'RGB')
+
+    extension = image_format.lower()
+    stem = PurePosixPath(source).stem
+    variants = {'source': source}
+    for name, size in get_option('VARIANTS').items():
+        resized = image.copy()
+        resized.thumbnail((size, size), Image.LANCZOS)
+        buffer = BytesIO()
+        resized.save(buffer, image_format, quality=quality, optimize=True)
+        variants[name] = default_storage.save(f'avatars/variants/{user_id}/{stem}-{name}.{extension}',
+                                              ContentFile(buffer.getvalue()))
+
+    # update() skips post_save, so the avatar is not re-queued; only store the
+    # variants if the avatar did not change while we were resizing. updated_at
+    # still moves, as the thumbnails are part of the profile's ETag.
+    if User.objects.filter(pk=user_id, avatar=source).update(avatar_variants=variants, updated_at=timezone.now()):
+        stale = [path for name, path in user.avatar_variants.items()
+                 if name != 'source' and path not in variants.values()]
+    else:
+        stale = [path for name, path in variants.items() if name != 'source']
+    for path in stale:
+        default_storage.delete(path)
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from apps.account.avatars import needs_processing, process_avatar
+from apps.account.models import User
+
+
+class Command(BaseCommand):
+    help = "Generate missing avatar variants synchronously, e.g. after changing AVATAR_PROCESSING['VARIANTS']."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants of every avatar.')
+
+    def handle(self, *args, **options):
+        users = User.objects.exclude(avatar='').exclude(avatar__isnull=True).only('id', 'avatar', 'avatar_variants')
+        processed = 0
+        for user in users.iterator():
+            if not options['all'] and not needs_processing(user):
+                continue
+            # Forced rather than cleared first, so the job still knows the old variant files to delete.
+            process_avatar(user.pk, force=options['all'])
+            processed += 1
+        self.stdout.write(f'Processed {processed} avatars.')
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:30
+
+import apps.account.models
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('account', '0004_user_avatar_variants'),
+    ]
+
+    operations = [
+        migrations.AlterModelManagers(
+            name='user',
+            managers=[
+                ('objects', apps.account.models.UserManager()),
+            ],
+        ),
+    ]
@@ -1,5 +1,5 @@
 from rest_framework_simplejwt.tokens import RefreshToken
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager as BaseUserManager
 from django.db import models
 
 
@@ -27,17 +27,38 @@ class Company(BaseModel):
         return self.name
 
 
+class UserQuerySet(models.QuerySet):
+    def update(self, **kwargs):
+        # update() sends no post_save, so drop the cached authentication entries it makes stale here.
+        from apps.account.authentication import CACHED_FIELDS, invalidate_users_on_commit
+
+        fields = {self.model._meta.get_field(name).attname for name in kwargs}
+        if not fields & {'password', *CACHED_FIELDS} - {'id'}:
+            return super().update(**kwargs)
+        user_ids = list(self.values_list('pk', flat=True))
+        rows = super().update(**kwargs)
+        invalidate_users_on_commit(user_ids, using=self.db)
+        return rows
+
+
+class UserManager(BaseUserManager.from_queryset(UserQuerySet)):
+    pass
+
 
 class User(AbstractUser, BaseModel):
     role = models.CharField(max_length=10, choices=ROLE_CHOICES, default='user')
     phone_number = models.CharField(max_length=15, null=True, blank=True)
     avatar = models.ImageField(upload_to='avatars/', null=True, blank=True)
+    # Resized copies of ``avatar`` written by apps.account.avatars: {"source": <avatar name>, <variant>: <path>}
+    avatar_variants = models.JSONField(default=dict, blank=True)
     start = models.TimeField(null=True, blank=True)
     end = models.TimeField(null=True, blank=True)
     break_start = models.TimeField(null=True, blank=True)
     break_end = models.TimeField(null=True, blank=True)
     company = models.ForeignKey('Company', on_delete=models.SET_NULL, null=True, related_name='employees')
 
+    objects = UserManager()
+
     @property
     def tokens(self):
         refresh = RefreshToken.for_user(self)
@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.account import avatars
+from apps.account.authentication import invalidate_users_on_commit
+from apps.account.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, using, **kwargs):
+    invalidate_users_on_commit([instance.pk], using=using)
+
+
+@receiver(post_save, sender=User)
+def queue_avatar_processing(sender, instance, raw=False, **kwargs):
+    if not raw and avatars.needs_processing(instance):
+        avatars.schedule(instance.pk)
@@ -1,3 +1,356 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+from datetime import time
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connections, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import serializers
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+
+from apps.account.authentication import CachedJWTAuthentication, get_cache, user_cache_key
+from apps.account.avatars import process_avatar
+from apps.account.api.serializers import CompanySerializer
+from apps.account.models import User, Company
+from config import middleware, schema, startup
+
+
+class QueryCountTests(APITestCase):
+    """Guard against N+1 queries: each endpoint must cost the same for 1 or many rows.
+
+    Conditional views add one query for their ETag, see config.conditional.
+    """
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='admin', role='admin')
+        self.client.force_authenticate(self.admin)
+
+    def add_companies(self, count, employees=3):
+        for i in range(count):
+            company = Company.objects.create(name=f'company-{i}', address='address')
+            for j in range(employees):
+                User.objects.create_user(username=f'barber-{company.pk}-{j}', role='barber',
+                                         company=company, start=time(9), end=time(18))
+        return company
+
+    def test_company_list(self):
+        self.add_companies(1)
+        with self.assertNumQueries(3):
+            self.client.get('/api/v1/Companies/')
+        self.add_companies(5)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/v1/Companies/')
+        self.assertEqual(len(response.data), 6)
+        self.assertEqual(len(response.data[0]['employees']), 3)
+
+    def test_company_detail(self):
+        company = self.add_companies(1, employees=10)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/Company/{company.pk}/')
+        self.assertEqual(response.data['employees'][0]['company'], company.name)
+
+    def test_barber_list(self):
+        self.add_companies(1)
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/Profiles/')
+        self.add_companies(5)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/Profiles/')
+        self.assertEqual(len(response.data['results']), 19)
+
+
+class AuthenticationCacheTests(APITestCase):
+    def setUp(self):
+        get_cache().clear()
+        # Entries outlive the rolled back test transaction, and later tests reuse the ids.
+        self.addCleanup(get_cache().clear)
+        self.user = User.objects.create_user(username='user', password='user', role='barber')
+        self.token = AccessToken.for_user(self.user)
+
+    def authenticate(self):
+        return CachedJWTAuthentication().get_user(self.token)
+
+    def cached(self):
+        return get_cache().get(user_cache_key(self.user.pk))
+
+    def test_hit(self):
+        with self.assertNumQueries(1):
+            self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual((user.pk, user.role, user.is_active), (self.user.pk, 'barber', True))
+        self.assertNotIn('password', self.cached())
+        # Fields that are not cached are still there, loaded on access.
+        with self.assertNumQueries(1):
+            self.assertTrue(user.check_password('user'))
+
+    def test_invalidated_on_save_and_delete(self):
+        self.authenticate()
+        self.user.role = 'admin'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.save()
+        self.assertIsNone(self.cached())
+        self.assertEqual(self.authenticate().role, 'admin')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.delete()
+        self.assertIsNone(self.cached())
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_invalidated_on_commit(self):
+        # As in the admin, which saves inside atomic(): until the commit, a concurrent request
+        # would read the old row, so dropping the entry earlier would only have it cached again.
+        self.authenticate()
+        with self.captureOnCommitCallbacks() as callbacks:
+            with transaction.atomic():
+                self.user.is_active = False
+                self.user.save()
+                User.objects.filter(pk=self.user.pk).update(role='admin')
+            self.assertIsNotNone(self.cached())
+        for callback in callbacks:
+            callback()
+        self.assertIsNone(self.cached())
+
+    def test_invalidated_on_update(self):
+        self.authenticate()
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(avatar_variants={'source': 'avatar.png'})
+        self.assertIsNotNone(self.cached())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(self.cached())
+        with self.assertRaisesMessage(AuthenticationFailed, 'User is inactive'):
+            self.authenticate()
+        # Inactive users are rejected from the cached entry too.
+        with self.assertNumQueries(0), self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+class AvatarTests(APITestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        override = override_settings(MEDIA_ROOT=media)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='user', password='user', avatar=self.image('face.png'))
+        self.client.force_authenticate(self.user)
+
+    @staticmethod
+    def image(name, size=(400, 300)):
+        from PIL import Image
+
+        buffer = BytesIO()
+        Image.new('RGB', size, 'red').save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def variants(self):
+        self.user.refresh_from_db()
+        return {name: path for name, path in self.user.avatar_variants.items() if name != 'source'}
+
+    def test_pipeline(self):
+        from PIL import Image
+
+        process_avatar(self.user.pk)
+        variants = self.variants()
+        self.assertEqual(self.user.avatar_variants['source'], self.user.avatar.name)
+        self.assertEqual(set(variants), {'thumb', 'small', 'medium'})
+        with default_storage.open(variants['thumb']) as file:
+            image = Image.open(file)
+            self.assertEqual((image.format, image.size), ('WEBP', (64, 48)))
+        # Up to date: nothing is written again.
+        with mock.patch.object(default_storage, 'save') as save:
+            process_avatar(self.user.pk)
+        save.assert_not_called()
+
+    def test_transparency_kept(self):
+        from PIL import Image
+
+        for mode, color in (('RGBA', (255, 0, 0, 0)), ('P', 0)):
+            image = Image.new(mode, (400, 300), color)
+            buffer = BytesIO()
+            image.save(buffer, 'PNG', **({'transparency': 0} if mode == 'P' else {}))
+            with self.subTest(mode=mode):
+                self.user.avatar = SimpleUploadedFile(f'{mode}.png', buffer.getvalue(), content_type='image/png')
+                self.user.save()
+                process_avatar(self.user.pk)
+                with default_storage.open(self.variants()['thumb']) as file:
+                    thumb = Image.open(file)
+                    self.assertEqual(thumb.mode, 'RGBA')
+                    self.assertEqual(thumb.getpixel((0, 0))[3], 0)
+
+        # Opaque uploads stay RGB.
+        self.user.avatar = self.image('opaque.png')
+        self.user.save()
+        process_avatar(self.user.pk)
+        with default_storage.open(self.variants()['thumb']) as file:
+            self.assertEqual(Image.open(file).mode, 'RGB')
+
+    def test_replaced_avatar_cleans_up(self):
+        process_avatar(self.user.pk)
+        old = self.variants()
+        self.user.avatar = self.image('new.png')
+        self.user.save()
+        process_avatar(self.user.pk)
+        self.assertTrue(all(default_storage.exists(path) for path in self.variants().values()))
+        self.assertFalse(any(default_storage.exists(path) for path in old.values()))
+
+    def test_avatar_changed_while_processing(self):
+        save = default_storage.save
+        written = []
+
+        def save_and_replace(name, content):
+            # Another upload lands while the old avatar is being resized.
+            User.objects.filter(pk=self.user.pk).update(avatar='avatars/newer.png')
+            written.append(save(name, content))
+            return written[-1]
+
+        with mock.patch.object(default_storage, 'save', side_effect=save_and_replace):
+            process_avatar(self.user.pk)
+        self.assertEqual(self.variants(), {})
+        self.assertEqual(len(written), 3)
+        self.assertFalse(any(default_storage.exists(path) for path in written))
+
+    def test_command_all(self):
+        process_avatar(self.user.pk)
+        old = self.variants()
+        out = StringIO()
+        call_command('process_avatars', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Processed 0 avatars.')
+        call_command('process_avatars', '--all', stdout=out)
+        self.assertIn('Processed 1 avatars.', out.getvalue())
+        self.assertNotEqual(self.variants(), old)
+        self.assertTrue(all(default_storage.exists(path) for path in self.variants().values()))
+        self.assertFalse(any(default_storage.exists(path) for path in old.values()))
+
+    def test_variants_change_etag(self):
+        etag = self.client.get('/api/v1/Profile/')['ETag']
+        process_avatar(self.user.pk)
+        self.assertEqual(self.client.get('/api/v1/Profile/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class SchemaTests(APITestCase):
+    def setUp(self):
+        schema._schema = None
+        self.addCleanup(setattr, schema, '_schema', None)
+
+    def test_served_with_etag(self):
+        response = self.client.get('/openapi.json')
+        self.assertIn('/v1/Bookings/', json.loads(response.content)['paths'])
+        self.assertNotIn('host', json.loads(response.content))
+        self.assertEqual(self.client.get('/openapi.json', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get('/swagger/?format=openapi').content, response.content)
+
+    def test_views_introspected(self):
+        with self.assertLogs('drf_yasg', 'WARNING') as logs:
+            schema.generate()
+        failed = {record.args[0] for record in logs.records if 'during schema generation' in record.msg}
+        # Both read request.user, which is anonymous during schema generation.
+        self.assertEqual(failed, {'BookingDetailAPIView', 'UserOrBarberRetrieveUpdateAPIView'})
+
+    def test_artifact(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'openapi.json')
+            with override_settings(OPENAPI_SCHEMA_FILE=path):
+                with self.assertRaises(CommandError):
+                    call_command('generate_schema', '--check', stdout=StringIO())
+                call_command('generate_schema', stdout=StringIO())
+                call_command('generate_schema', '--check', stdout=StringIO())
+                with open(path, 'wb') as artifact:
+                    artifact.write(b'{"swagger": "2.0"}')
+                # Workers serve the file as written, without generating anything.
+                self.assertEqual(self.client.get('/openapi.json').content, b'{"swagger": "2.0"}')
+
+
+class InstrumentationTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser(username='admin', password='admin', role='admin')
+        self.client.force_authenticate(self.admin)
+        Company.objects.create(name='company', address='address')
+
+    def get(self, **options):
+        # The middleware reads its options when the test client builds its handler, on the first request.
+        options = dict({'SAMPLE_RATE': 1.0, 'SLOW_REQUEST_MS': 60000, 'SERVER_TIMING': False}, **options)
+        with override_settings(INSTRUMENTATION=options), \
+                self.assertLogs('config.instrumentation', 'DEBUG') as logs:
+            client = self.client_class()
+            client.force_authenticate(self.admin)
+            response = client.get('/api/v1/Companies/')
+        return response, [(record.levelname, json.loads(record.getMessage())) for record in logs.records]
+
+    def test_sampled(self):
+        response, logs = self.get()
+        self.assertFalse(response.has_header('Server-Timing'))
+        [(level, record)] = logs
+        self.assertEqual(level, 'DEBUG')
+        self.assertEqual((record['view'], record['sampled'], record['slow']), ('GetCompany', True, False))
+        self.assertGreater(record['queries'], 0)
+
+    def test_server_timing(self):
+        response, _ = self.get(SERVER_TIMING=True)
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", serializer')
+
+    def test_unsampled_requests_only_logged_when_slow(self):
+        with self.assertRaises(AssertionError):
+            self.get(SAMPLE_RATE=0, SERVER_TIMING=True)
+        response, [(level, record)] = self.get(SAMPLE_RATE=0, SLOW_REQUEST_MS=0, SERVER_TIMING=True)
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(level, 'WARNING')
+        self.assertEqual((record['sampled'], record['slow']), (False, True))
+        self.assertNotIn('queries', record)
+
+    def test_serializer_timing(self):
+        middleware.instrument_serializers()
+        instrumented = serializers.BaseSerializer.data
+        middleware.instrument_serializers()
+        self.assertIs(serializers.BaseSerializer.data, instrumented)
+        self.assertTrue(instrumented.fget.instrumented)
+
+        companies = Company.objects.all()
+        metrics = middleware.RequestMetrics()
+        token = middleware._metrics.set(metrics)
+        try:
+            data = CompanySerializer(companies, many=True).data
+        finally:
+            middleware._metrics.reset(token)
+        self.assertEqual(data, CompanySerializer(companies, many=True).data)
+        self.assertGreater(metrics.serializer_time, 0)
+        self.assertFalse(metrics.serializing)
+
+
+class SqlitePragmaTests(TestCase):
+    def pragmas(self, alias='default'):
+        connection = connections.create_connection(alias)
+        try:
+            with connection.cursor() as cursor:
+                return {name: cursor.execute(f'PRAGMA {name}').fetchone()[0]
+                        for name in ('cache_size', 'temp_store')}
+        finally:
+            connection.close()
+
+    def test_new_connections(self):
+        default = self.pragmas()
+        with override_settings(SQLITE_PRAGMAS={'cache_size': -1234, 'temp_store': 'MEMORY'}):
+            self.assertEqual(self.pragmas(), {'cache_size': -1234, 'temp_store': 2})
+        self.assertEqual(self.pragmas(), default)
+
+
+class StartupTests(SimpleTestCase):
+    def test_boot(self):
+        result = startup.profile('config.wsgi')
+        # Docs, image processing and the admin load on first use, not in every worker.
+        for module in ('drf_yasg', 'PIL', 'apps.account.admin'):
+            self.assertNotIn(module, result['boot_modules'])
+            self.assertNotIn(module, result['url_modules'])
+        self.assertLess(result['boot_ms'], settings.STARTUP_BUDGET_MS)
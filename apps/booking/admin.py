@@ -1,8 +1,12 @@
 from django.contrib import admin
-from .models import Booking
+from .models import Booking, BookingArchive
 
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
     list_display = ['resident', 'room', 'start', 'end', 'created_at']
 
+
+@admin.register(BookingArchive)
+class BookingArchiveAdmin(admin.ModelAdmin):
+    list_display = ['resident', 'room', 'start', 'end', 'archived_at']
@@ -0,0 +1,156 @@
+import asyncio
+import json
+from contextlib import AsyncExitStack
+from datetime import datetime, time, timedelta
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.filters import OrderingFilter
+from rest_framework.request import Request
+
+from apps.account.models import User
+from apps.booking import cache as availability_cache
+from apps.booking.broker import broker, get_option
+from apps.booking.models import Booking, BookingArchive
+from apps.booking.schedule import DaySchedule, sweep_schedules
+from config.async_views import AsyncAPIView
+from config.conditional import aggregates, make_etag
+from config.pagination import KeysetPagination
+
+from .serializers import BookingArchiveListSerializer, BookingListSerializer, RoomAvailabilitySerializer
+from .views import BookingListAPIView
+
+
+async def day_schedules(room_id, days):
+    """Async RoomAvailabilityRetrieveView.day_schedules."""
+    async def compute_many(missing):
+        return {day: schedule.busy for day, schedule in await build_schedules(room_id, missing)}
+
+    busy = await availability_cache.aget_many_or_compute(room_id, days, compute_many)
+    return {day: DaySchedule(day, busy[day]) for day in days}
+
+
+async def build_schedules(room_id, days):
+    days = sorted(days)
+    window_start = timezone.make_aware(datetime.combine(days[0], time.min))
+    window_end = timezone.make_aware(datetime.combine(days[-1], time.min)) + timedelta(days=1)
+
+    try:
+        room = await User.objects.aget(id=room_id)
+    except User.DoesNotExist:
+        raise Http404
+
+    bookings = [
+        booking async for booking in Booking.objects.active().filter(
+            room_id=room_id, start__lt=window_end, end__gt=window_start
+        ).order_by('start').values_list('start', 'end')
+    ]
+    return sweep_schedules(room, days, bookings)
+
+
+class AsyncRoomAvailabilityView(AsyncAPIView):
+    """ASGI version of RoomAvailabilityRetrieveView."""
+
+    async def get(self, request, pk):
+        try:
+            day = datetime.strptime(request.GET['date'], '%d-%m-%Y').date() if 'date' in request.GET \
+                else timezone.localdate()
+        except ValueError:
+            return self.render({'error': 'Dates must be in dd-mm-YYYY format'}, status.HTTP_400_BAD_REQUEST)
+        schedules = await day_schedules(pk, [day])
+        return self.render(RoomAvailabilitySerializer(schedules[day].availability(), many=True).data)
+
+
+class AsyncBookingListView(AsyncAPIView):
+    """ASGI version of BookingListAPIView, with the same cursor pagination, ordering, ?archived= and ETag."""
+    login_required = True
+    pagination_class = KeysetPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['id', 'start']
+    ordering = ['-id']
+
+    async def get(self, request):
+        # OrderingFilter and the paginator read query_params from a DRF request.
+        drf_request = Request(request)
+        archived = request.GET.get('archived') in ('1', 'true')
+        model, serializer_class = (BookingArchive, BookingArchiveListSerializer) if archived \
+            else (Booking, BookingListSerializer)
+        queryset = model.objects.filter(resident=request.user).order_by('-id')
+
+        # The sync view's validators, for JSON: either view answers the other's If-None-Match.
+        summary = await queryset.aaggregate(**aggregates(BookingListAPIView.last_modified_fields))
+        etag = make_etag(summary, request.user.pk, self.renderer.media_type)
+        if get_conditional_response(request, etag=etag) is not None:
+            response = HttpResponseNotModified()
+        else:
+            for backend in self.filter_backends:
+                queryset = backend().filter_queryset(drf_request, queryset, self)
+            paginator = self.pagination_class()
+            # CursorPagination evaluates its slice synchronously: one thread hop, as an async ORM call would take.
+            page = await sync_to_async(paginator.paginate_queryset)(queryset, drf_request, self)
+            data = serializer_class(page, many=True).data
+            response = self.render(paginator.get_paginated_response(data).data)
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class RoomAvailabilityStreamView(AsyncAPIView):
+    """Server-Sent Events for the free slots of a barber on one day, instead of polling RoomAvailability.
+
+    The stream opens with a ``snapshot`` event ({"date", "slots"}) and then sends a
+    ``changes`` event ({"date", "added", "removed"}) whenever bookings change the
+    slots. A ``snapshot`` can come again if the client falls behind. Event ids are
+    versions of that day. The server ends the stream after MAX_SECONDS and
+    EventSource reconnects by itself. Needs the ASGI server. Django 4.2 still
+    parks one idle thread per open stream, because it sends request_started
+    through sync_to_async.
+    """
+
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return self.render({'detail': 'Availability streams need the ASGI server.'},
+                               status.HTTP_501_NOT_IMPLEMENTED)
+        try:
+            day = datetime.strptime(request.GET['date'], '%d-%m-%Y').date() if 'date' in request.GET \
+                else timezone.localdate()
+        except ValueError:
+            return self.render({'error': 'Dates must be in dd-mm-YYYY format'}, status.HTTP_400_BAD_REQUEST)
+
+        async def load():
+            # Straight from the database: the stream must not echo a cache entry refilled before the commit.
+            return dict(await build_schedules(pk, [day]))[day].availability()
+
+        stack = AsyncExitStack()
+        # Entered here so an unknown barber is still a plain 404 response.
+        subscription = await stack.enter_async_context(broker.subscribe(pk, day, load))
+        response = StreamingHttpResponse(self.events(stack, day, *subscription), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    async def events(self, stack, day, version, slots, queue):
+        label = day.strftime('%d-%m-%Y')
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + get_option('MAX_SECONDS', 600)
+        async with stack:
+            yield self.event('snapshot', version, {'date': label, 'slots': slots})
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    kind, version, data = await asyncio.wait_for(
+                        queue.get(), min(get_option('KEEPALIVE_SECONDS', 15), remaining)
+                    )
+                except asyncio.TimeoutError:
+                    # Keeps proxies from closing an idle stream and surfaces disconnected clients.
+                    yield ': keepalive\n\n'
+                    continue
+                payload = {'date': label, 'slots': data} if kind == 'snapshot' else {'date': label, **data}
+                yield self.event(kind, version, payload)
+
+    @staticmethod
+    def event(kind, version, data):
+        return f'event: {kind}\nid: {version}\ndata: {json.dumps(data)}\n\n'
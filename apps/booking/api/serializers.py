@@ -1,9 +1,16 @@
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from django.db import transaction
+from django.utils import timezone
 from rest_framework import serializers
 
 from apps.account.api.serializers import UserSerializer, BarberUserSerializer
-from apps.booking.models import Booking
+from apps.booking.models import Booking, BookingArchive
+from apps.account.models import User
+from apps.booking.services import bulk_book, lock_room
+
+MAX_BULK_BOOKINGS = 500
+MAX_RECURRENCE_INTERVAL = 365
 
 
 class BookingCreatedSerializer(serializers.ModelSerializer):
@@ -21,24 +28,106 @@ class BookingCreatedSerializer(serializers.ModelSerializer):
         end = validated_data.get('end')
         room = validated_data.get('room')
 
-        if Booking.objects.filter(room=room, start__lte=start, end__gte=start).exists() or \
-                Booking.objects.filter(room=room, start__lte=end, end__gte=end).exists() or \
-                Booking.objects.filter(room=room, start__gte=start, end__lte=end).exists():
-            raise serializers.ValidationError("The room is already booked for that time")
-
         if start > end:
             raise serializers.ValidationError("Start time cannot be greater than end time")
 
-        booking = Booking.objects.create(**validated_data)
+        with transaction.atomic():
+            if room is not None:
+                lock_room(room.pk)
+            if Booking.objects.overlapping(room, start, end).exists():
+                raise serializers.ValidationError("The room is already booked for that time")
+            booking = Booking.objects.create(**validated_data)
         return booking
 
 
+class BookingIntervalSerializer(serializers.Serializer):
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("Start time cannot be greater than end time")
+        return attrs
+
+
+class RecurrenceSerializer(serializers.Serializer):
+    FREQUENCIES = {'daily': timedelta(days=1), 'weekly': timedelta(weeks=1)}
+
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    freq = serializers.ChoiceField(choices=list(FREQUENCIES))
+    interval = serializers.IntegerField(min_value=1, max_value=MAX_RECURRENCE_INTERVAL, default=1)
+    count = serializers.IntegerField(min_value=1, max_value=MAX_BULK_BOOKINGS, required=False)
+    until = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError("Start time cannot be greater than end time")
+        if ('count' in attrs) == ('until' in attrs):
+            raise serializers.ValidationError("Provide exactly one of 'count' or 'until'")
+        return attrs
+
+    def expand(self, recurrence):
+        # Stepping in local wall-clock time keeps "every Tuesday 10:00" at 10:00.
+        start = timezone.localtime(recurrence['start'])
+        length = recurrence['end'] - recurrence['start']
+        step = self.FREQUENCIES[recurrence['freq']] * recurrence['interval']
+        intervals = []
+        while len(intervals) < recurrence.get('count', MAX_BULK_BOOKINGS + 1):
+            if 'until' in recurrence and start.date() > recurrence['until']:
+                break
+            try:
+                intervals.append((start, start + length))
+                start += step
+            except OverflowError:
+                raise serializers.ValidationError("The recurrence runs past the last supported date")
+        return intervals
+
+
+class BookingBulkCreateSerializer(serializers.Serializer):
+    room = serializers.PrimaryKeyRelatedField(queryset=User.objects.all())
+    items = BookingIntervalSerializer(many=True, required=False)
+    recurrence = RecurrenceSerializer(required=False)
+
+    def validate(self, attrs):
+        if ('items' in attrs) == ('recurrence' in attrs):
+            raise serializers.ValidationError("Provide exactly one of 'items' or 'recurrence'")
+        if 'recurrence' in attrs:
+            intervals = RecurrenceSerializer().expand(attrs['recurrence'])
+        else:
+            intervals = [(item['start'], item['end']) for item in attrs['items']]
+        if not intervals:
+            raise serializers.ValidationError("Nothing to book")
+        if len(intervals) > MAX_BULK_BOOKINGS:
+            raise serializers.ValidationError(f"At most {MAX_BULK_BOOKINGS} bookings can be created at once")
+        attrs['intervals'] = intervals
+        return attrs
+
+    def create(self, validated_data):
+        intervals = validated_data['intervals']
+        created, conflicts = bulk_book(validated_data['room'], self.context['request'].user, intervals)
+        return {
+            'created': created,
+            'conflicts': [
+                {'index': index, 'start': intervals[index][0], 'end': intervals[index][1],
+                 'error': "The room is already booked for that time"}
+                for index in conflicts
+            ],
+        }
+
+
 class BookingListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Booking
         fields = ('id', 'room', 'resident', 'start', 'end', 'created_at')
 
 
+class BookingArchiveListSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BookingArchive
+        fields = ('id', 'room', 'resident', 'start', 'end', 'created_at', 'archived_at')
+
+
 class BookingDetailSerializer(serializers.ModelSerializer):
     room = BarberUserSerializer(read_only=True)
     resident = UserSerializer(read_only=True)
@@ -69,6 +158,88 @@ class RoomAvailabilitySerializer(serializers.ModelSerializer):
         fields = ('start', 'end')
 
 
+# Responses the views below build by hand. They describe them in the API schema; importing
+# drf_yasg for swagger_auto_schema here would load it in every worker.
+
+class NextSlotSerializer(serializers.Serializer):
+    barber = serializers.IntegerField()
+    username = serializers.CharField()
+    start = serializers.CharField(help_text='dd-mm-YYYY HH:MM:SS')
+    end = serializers.CharField(help_text='dd-mm-YYYY HH:MM:SS')
+
+
+class DateRangeSerializer(serializers.Serializer):
+    to = serializers.CharField(help_text='dd-mm-YYYY')
+
+    def get_fields(self):
+        # 'from' is a keyword, so it cannot be declared as a field.
+        return {'from': serializers.CharField(help_text='dd-mm-YYYY'), **super().get_fields()}
+
+
+class UtilizationSerializer(serializers.Serializer):
+    working_minutes = serializers.IntegerField()
+    booked_minutes = serializers.IntegerField()
+    bookings = serializers.IntegerField()
+    utilization = serializers.FloatField(allow_null=True)
+
+
+class UtilizationPeriodSerializer(UtilizationSerializer):
+    start = serializers.CharField(help_text='dd-mm-YYYY')
+
+
+class UtilizationBarberSerializer(UtilizationSerializer):
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+
+
+class CompanyUtilizationSerializer(DateRangeSerializer):
+    period = serializers.ChoiceField(choices=['day', 'week', 'month'])
+    total = UtilizationSerializer()
+    periods = UtilizationPeriodSerializer(many=True)
+    barbers = UtilizationBarberSerializer(many=True)
+
+
+class PeakHourSerializer(serializers.Serializer):
+    hour = serializers.CharField(help_text='HH:00')
+    working_minutes = serializers.IntegerField()
+    booked_minutes = serializers.IntegerField()
+    utilization = serializers.FloatField(allow_null=True)
+
+
+class CompanyPeakHoursSerializer(DateRangeSerializer):
+    hours = PeakHourSerializer(many=True)
+    peak = serializers.ListField(child=serializers.CharField(), help_text='The three busiest hours')
+
+
+class BookingExportRowSerializer(serializers.Serializer):
+    """One CSV row or NDJSON line of an export."""
+    id = serializers.IntegerField()
+    start = serializers.DateTimeField()
+    end = serializers.DateTimeField()
+    barber_id = serializers.IntegerField()
+    barber = serializers.CharField()
+    resident_id = serializers.IntegerField(allow_null=True)
+    resident = serializers.CharField(allow_null=True)
+    is_active = serializers.BooleanField()
+    archived = serializers.BooleanField()
+    created_at = serializers.DateTimeField()
+
+
+class CalendarLinkSerializer(serializers.Serializer):
+    url = serializers.URLField()
+
+
+class CalendarFeedSerializer(serializers.Serializer):
+    """The feed is a text/calendar body, not JSON; nothing to describe field by field."""
+
+
+class AvailabilityCacheStatsSerializer(serializers.Serializer):
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+    hit_ratio = serializers.FloatField(allow_null=True)
+    backend = serializers.CharField()
+
+
 #
 # class RoomSerializer(serializers.ModelSerializer):
 #     class Meta:
@@ -1,10 +1,28 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('Booking/', views.BookingCreateAPIView.as_view(), name='CreateBooking'),
+    path('Booking/Bulk/', views.BookingBulkCreateAPIView.as_view(), name='BulkCreateBooking'),
     path('Bookings/', views.BookingListAPIView.as_view(), name='ListBooking'),
     path('Booking/<int:pk>/', views.BookingDetailAPIView.as_view(), name='DetailBooking'),
     path('Room/<int:pk>/Availability/', views.RoomAvailabilityRetrieveView.as_view(), name='RoomAvailability'),
+    path('Room/<int:pk>/Availability/Range/', views.RoomAvailabilityRangeRetrieveView.as_view(),
+         name='RoomAvailabilityRange'),
+    path('Company/<int:pk>/Availability/', views.CompanyAvailabilityRetrieveView.as_view(),
+         name='CompanyAvailability'),
+    path('Company/<int:pk>/NextSlots/', views.CompanyNextSlotsAPIView.as_view(), name='CompanyNextSlots'),
+    path('Company/<int:pk>/Utilization/', views.CompanyUtilizationAPIView.as_view(), name='CompanyUtilization'),
+    path('Company/<int:pk>/PeakHours/', views.CompanyPeakHoursAPIView.as_view(), name='CompanyPeakHours'),
+    path('Company/<int:pk>/Export/', views.CompanyBookingExportAPIView.as_view(), name='CompanyBookingExport'),
+    path('Room/<int:pk>/Calendar/', views.RoomCalendarLinkAPIView.as_view(), name='RoomCalendarLink'),
+    path('Room/<int:pk>/Calendar.ics', views.RoomCalendarFeedView.as_view(), name='RoomCalendar'),
+    path('Availability/Stats/', views.AvailabilityCacheStatsAPIView.as_view(), name='AvailabilityCacheStats'),
     path('Room/', views.RoomBookingAPIView.as_view(), name='ListRoom'),
+    # ASGI (async ORM) versions of the hot read endpoints.
+    path('Async/Bookings/', async_views.AsyncBookingListView.as_view(), name='AsyncListBooking'),
+    path('Async/Room/<int:pk>/Availability/', async_views.AsyncRoomAvailabilityView.as_view(),
+         name='AsyncRoomAvailability'),
+    path('Room/<int:pk>/Availability/Stream/', async_views.RoomAvailabilityStreamView.as_view(),
+         name='RoomAvailabilityStream'),
 ]
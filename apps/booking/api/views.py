@@ -1,18 +1,42 @@
-from datetime import datetime
-from django.db.models import Q
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from django.db.models import F, Sum
+from django.db.models.functions import TruncMonth, TruncWeek
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags
 from django.utils import timezone
-from apps.account.models import User
-from apps.booking.models import Booking
+from apps.account.models import User, Company
+from apps.booking.models import Booking, BookingArchive, DailyOccupancy
 from rest_framework import generics, status
+from rest_framework.filters import OrderingFilter
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+
+from apps.booking import cache as availability_cache, calendar, export
+from apps.booking.schedule import DaySchedule, cell_ceil, cell_floor, cell_label, cell_minutes, sweep_schedules
+from apps.booking.search import next_free_slots
+from config.conditional import ConditionalMixin
+from config.pagination import KeysetPagination
 
 from .serializers import (
     BookingListSerializer,
+    BookingArchiveListSerializer,
     BookingDetailSerializer,
     BookingCreatedSerializer,
-    RoomAvailabilitySerializer
+    BookingBulkCreateSerializer,
+    BookingIntervalSerializer,
+    RoomAvailabilitySerializer,
+    NextSlotSerializer,
+    CompanyUtilizationSerializer,
+    CompanyPeakHoursSerializer,
+    BookingExportRowSerializer,
+    CalendarLinkSerializer,
+    CalendarFeedSerializer,
+    AvailabilityCacheStatsSerializer,
 )
 
 
@@ -26,19 +50,52 @@ class BookingCreateAPIView(generics.CreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
 
-class BookingListAPIView(generics.ListAPIView):
+class BookingBulkCreateAPIView(generics.CreateAPIView):
+    serializer_class = BookingBulkCreateSerializer
+    permission_classes = [IsAuthenticated]
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        result = serializer.save()
+        interval = BookingIntervalSerializer()
+        data = {
+            'created': BookingListSerializer(result['created'], many=True).data,
+            'conflicts': [
+                {'index': conflict['index'], **interval.to_representation(conflict), 'error': conflict['error']}
+                for conflict in result['conflicts']
+            ],
+        }
+        return Response(data, status=status.HTTP_201_CREATED if result['created'] else status.HTTP_400_BAD_REQUEST)
+
+
+class BookingListAPIView(ConditionalMixin, generics.ListAPIView):
     serializer_class = BookingListSerializer
     queryset = Booking.objects.all()
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [OrderingFilter]
+    ordering_fields = ['id', 'start']
+    ordering = ['-id']
+
+    def archived(self):
+        # ?archived=1 reads the bookings that archive_bookings moved out of the live table.
+        return self.request.query_params.get('archived') in ('1', 'true')
 
     def get_queryset(self):
-        return self.queryset.filter(resident=self.request.user).order_by('-id')
+        queryset = BookingArchive.objects.all() if self.archived() else self.queryset
+        return queryset.filter(resident=self.request.user).order_by('-id')
+
+    def get_serializer_class(self):
+        return BookingArchiveListSerializer if self.archived() else BookingListSerializer
 
 
-class BookingDetailAPIView(generics.RetrieveUpdateDestroyAPIView):
+class BookingDetailAPIView(ConditionalMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BookingDetailSerializer
-    queryset = Booking.objects.all()
+    queryset = Booking.objects.select_related('room__company', 'resident')
     permission_classes = [IsAuthenticated]
+    last_modified_fields = ('updated_at', 'room__updated_at', 'room__company__updated_at', 'resident__updated_at')
 
     def get_queryset(self):
         return self.queryset.filter(resident=self.request.user).order_by('-id')
@@ -70,6 +127,9 @@ class RoomAvailabilityRetrieveView(generics.ListAPIView):
     serializer_class = RoomAvailabilitySerializer
 
     def get_queryset(self):
+        if getattr(self, 'swagger_fake_view', False):
+            # Schema generation: there is no date to read, and the slots are not a queryset anyway.
+            return Booking.objects.none()
         room_id = self.kwargs.get('pk')
         curr_time = self.request.GET.get('date', timezone.now().strftime("%d-%m-%Y"))
 
@@ -77,59 +137,353 @@ class RoomAvailabilityRetrieveView(generics.ListAPIView):
         obj_date = datetime.strptime(curr_time, '%d-%m-%Y')
         cur_date = datetime(obj_date.year, obj_date.month, obj_date.day)
 
-        # Retrieve bookings for the given room and date
-        bookings = Booking.objects.filter(
-            Q(room_id=room_id),
-            Q(Q(start__date=cur_date) | Q(end__date=cur_date))
-        ).order_by('start')
+        day = cur_date.date()
+        return self.day_schedules(room_id, [day])[day].availability()
+
+    @classmethod
+    def day_schedules(cls, room_id, days):
+        """DaySchedule of ``room_id`` for each of ``days``, served from the availability cache.
+
+        Missing days are built from one booking query over the window they span.
+        """
+        busy = availability_cache.get_many_or_compute(
+            room_id, days,
+            lambda missing: {day: schedule.busy for day, schedule in cls.build_schedules(room_id, missing)}
+        )
+        return {day: DaySchedule(day, busy[day]) for day in days}
+
+    @staticmethod
+    def build_schedules(room_id, days):
+        days = sorted(days)
+        window_start = timezone.make_aware(datetime.combine(days[0], time.min))
+        window_end = timezone.make_aware(datetime.combine(days[-1], time.min)) + timedelta(days=1)
 
         # Retrieve room details
-        room = User.objects.get(id=room_id)
-        room_open = room.start
-        room_close = room.end
+        room = get_object_or_404(User, id=room_id)
 
-        booked_slots, room_open = self.booking_slots(cur_date, room_open, room_close, bookings)
+        # Retrieve bookings for the given room that touch the window
+        bookings = Booking.objects.active().filter(
+            room_id=room_id, start__lt=window_end, end__gt=window_start
+        ).order_by('start').values_list('start', 'end')
 
-        return self.date_availability(curr_time, room_open, room_close, booked_slots)
+        return sweep_schedules(room, days, bookings)
 
-    @staticmethod
-    def booking_slots(cur_date, room_open, room_close, bookings):
-        slots = []
-        for booking in bookings:
-            if booking.start.date() == cur_date.date():
-                start_time = booking.start.time()
-            else:
-                start_time = room_open
 
-            if booking.end.date() == cur_date.date():
-                end_time = booking.end.time()
+class DateRangeMixin:
+    """A ?from=&to= range of days (dd-mm-YYYY), at most ``max_days`` long.
+
+    Without them the range is today, or with ``default_month`` the current month;
+    a missing 'to' ends the day, or the month, of 'from'.
+    """
+    max_days = 366
+    default_month = False
+
+    def get_range(self, request):
+        """``(date_from, date_to, error)``, with an error message instead of the dates when they are invalid."""
+        today = timezone.localdate()
+        try:
+            if 'from' in request.GET:
+                date_from = datetime.strptime(request.GET['from'], '%d-%m-%Y').date()
+            else:
+                date_from = today.replace(day=1) if self.default_month else today
+            if 'to' in request.GET:
+                date_to = datetime.strptime(request.GET['to'], '%d-%m-%Y').date()
+            elif self.default_month:
+                date_to = (date_from.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1)
             else:
-                end_time = room_close
+                date_to = date_from
+        except ValueError:
+            return None, None, 'Dates must be in dd-mm-YYYY format'
+        if date_to < date_from:
+            return None, None, "'to' cannot be before 'from'"
+        if (date_to - date_from).days >= self.max_days:
+            return None, None, f'The range cannot be longer than {self.max_days} days'
+        # The range is queried as [midnight of 'from', midnight after 'to'), in UTC; keep a day
+        # clear of either end of the calendar so that cannot overflow.
+        if date_from <= date.min or date_to >= date.max:
+            return None, None, 'Dates must be between 02-01-0001 and 30-12-9999'
+        return date_from, date_to, None
+
+
+class RoomAvailabilityRangeRetrieveView(DateRangeMixin, RoomAvailabilityRetrieveView):
+    max_days = 62
+
+    def list(self, request, *args, **kwargs):
+        date_from, date_to, error = self.get_range(request)
+        if error is not None:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
 
-            slots.append((start_time, end_time))
-        return slots, room_open
+        room_id = self.kwargs.get('pk')
+        days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+        schedules = self.day_schedules(room_id, days)
+        return Response([
+            {
+                'date': day.strftime('%d-%m-%Y'),
+                'slots': self.get_serializer(schedules[day].availability(), many=True).data,
+            }
+            for day in days
+        ], status=status.HTTP_200_OK)
+
+
+class CompanyAvailabilityRetrieveView(RoomAvailabilityRetrieveView):
+    default_step = 30
+
+    def list(self, request, *args, **kwargs):
+        try:
+            day = datetime.strptime(request.GET['date'], '%d-%m-%Y').date() if 'date' in request.GET \
+                else timezone.localdate()
+            step = int(request.GET.get('step', self.default_step))
+        except ValueError:
+            return Response({'error': 'Expected date in dd-mm-YYYY format and an integer step'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        cell = cell_minutes()
+        if not cell <= step <= 240 or step % cell:
+            return Response({'error': f'Step must be a multiple of {cell} between {cell} and 240 minutes'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        company = get_object_or_404(Company, pk=self.kwargs.get('pk'))
+        barbers = list(User.objects.filter(company=company, role='barber').order_by('id'))
+
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        bookings_by_room = defaultdict(list)
+        for room_id, start, end in Booking.objects.active().filter(
+            room__in=barbers, start__lt=day_start + timedelta(days=1), end__gt=day_start
+        ).order_by('start').values_list('room_id', 'start', 'end'):
+            bookings_by_room[room_id].append((start, end))
+
+        working = [barber for barber in barbers if barber.start is not None and barber.end is not None]
+        grid_open = min((cell_ceil(barber.start) for barber in working), default=0)
+        grid_close = max((cell_floor(barber.end) for barber in working), default=0)
+        step_cells = step // cell
+        slot_cells = range(grid_open, grid_close - step_cells + 1, step_cells)
+
+        rows = []
+        for barber in barbers:
+            schedule = DaySchedule.build(day, barber, bookings_by_room[barber.pk])
+            # Bit i of ``fits`` is set when a free run of ``step`` minutes starts at cell i.
+            fits = schedule.fits(step_cells)
+            rows.append({
+                'id': barber.pk,
+                'username': barber.username,
+                'first_name': barber.first_name,
+                'last_name': barber.last_name,
+                'free': self.get_serializer(schedule.availability(), many=True).data,
+                'grid': [bool(fits >> cell & 1) for cell in slot_cells],
+            })
+
+        return Response({
+            'date': day.strftime('%d-%m-%Y'),
+            'step': step,
+            'slots': [cell_label(cell)[:5] for cell in slot_cells],
+            'barbers': rows,
+        }, status=status.HTTP_200_OK)
+
+
+class CompanyNextSlotsAPIView(generics.GenericAPIView):
+    queryset = Company.objects.all()
+    serializer_class = NextSlotSerializer
+    max_limit = 50
+    max_days = 31
+
+    def get(self, request, *args, **kwargs):
+        try:
+            duration = timedelta(minutes=int(request.GET['duration']))
+            limit = min(int(request.GET.get('limit', 5)), self.max_limit)
+            days = min(int(request.GET.get('days', 7)), self.max_days)
+            after = timezone.make_aware(datetime.strptime(request.GET['after'], '%d-%m-%Y %H:%M')) \
+                if 'after' in request.GET else timezone.now()
+        except (KeyError, ValueError):
+            return Response({'error': "Expected an integer 'duration' in minutes, optional integer 'limit' and "
+                                      "'days', and 'after' in dd-mm-YYYY HH:MM format"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if duration <= timedelta(0) or limit <= 0 or days <= 0:
+            return Response({'error': "'duration', 'limit' and 'days' must be positive"},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        company = self.get_object()
+        barbers = list(User.objects.filter(company=company, role='barber').order_by('id'))
+        until = after + timedelta(days=days)
+
+        bookings_by_barber = defaultdict(list)
+        for room_id, start, end in Booking.objects.active().filter(
+            room__in=barbers, start__lt=until, end__gt=after
+        ).order_by('start').values_list('room_id', 'start', 'end'):
+            bookings_by_barber[room_id].append((start, end))
+
+        slots = next_free_slots(barbers, bookings_by_barber, duration, after, until, limit)
+        return Response([
+            {
+                'barber': barber.pk,
+                'username': barber.username,
+                'start': timezone.localtime(start).strftime('%d-%m-%Y %H:%M:%S'),
+                'end': timezone.localtime(start + duration).strftime('%d-%m-%Y %H:%M:%S'),
+            }
+            for barber, start in slots
+        ], status=status.HTTP_200_OK)
+
+
+class OccupancyReportAPIView(DateRangeMixin, generics.GenericAPIView):
+    """Base of the company occupancy reports over a range of days; they read DailyOccupancy only."""
+    permission_classes = [IsAdminUser]
+    queryset = Company.objects.all()
+    default_month = True
 
     @staticmethod
-    def date_availability(curr_time, room_open, room_close, booked_slots):
-        # Calculate available time slots
-        availability_list = []
-        previous_end = room_open
-
-        for start, end in booked_slots:
-            if previous_end < start:
-                availability_list.append({
-                    "start": f"{curr_time} {previous_end}",
-                    "end": f"{curr_time} {start}"
-                })
-            previous_end = end
-
-        if previous_end < room_close:
-            availability_list.append({
-                "start": f"{curr_time} {previous_end}",
-                "end": f"{curr_time} {room_close}"
-            })
+    def utilization(working, booked):
+        return round(booked / working, 4) if working else None
+
+
+class CompanyUtilizationAPIView(OccupancyReportAPIView):
+    serializer_class = CompanyUtilizationSerializer
+    periods = {
+        'day': F('day'),
+        'week': TruncWeek('day'),
+        'month': TruncMonth('day'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        date_from, date_to, error = self.get_range(request)
+        period = request.GET.get('period', 'day')
+        if error is None and period not in self.periods:
+            error = f"'period' must be one of {', '.join(self.periods)}"
+        if error is not None:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        company = self.get_object()
+        rows = DailyOccupancy.objects.filter(company=company, day__range=(date_from, date_to))
+        totals = {'working': Sum('working_minutes'), 'booked': Sum('booked_minutes'), 'bookings': Sum('bookings')}
+
+        def entry(row, **extra):
+            return {
+                **extra,
+                'working_minutes': row['working'] or 0,
+                'booked_minutes': row['booked'] or 0,
+                'bookings': row['bookings'] or 0,
+                'utilization': self.utilization(row['working'], row['booked']),
+            }
+
+        by_period = rows.annotate(period=self.periods[period]).values('period').annotate(**totals).order_by('period')
+        by_barber = rows.values('barber_id', 'barber__username').annotate(**totals).order_by('barber_id')
+        return Response({
+            'from': date_from.strftime('%d-%m-%Y'),
+            'to': date_to.strftime('%d-%m-%Y'),
+            'period': period,
+            'total': entry(rows.aggregate(**totals)),
+            'periods': [entry(row, start=row['period'].strftime('%d-%m-%Y')) for row in by_period],
+            'barbers': [entry(row, id=row['barber_id'], username=row['barber__username']) for row in by_barber],
+        }, status=status.HTTP_200_OK)
+
+
+class CompanyPeakHoursAPIView(OccupancyReportAPIView):
+    serializer_class = CompanyPeakHoursSerializer
+
+    def get(self, request, *args, **kwargs):
+        date_from, date_to, error = self.get_range(request)
+        if error is not None:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        company = self.get_object()
+        working, booked = [0] * 24, [0] * 24
+        for working_hourly, booked_hourly in DailyOccupancy.objects.filter(
+            company=company, day__range=(date_from, date_to)
+        ).values_list('working_hourly', 'booked_hourly'):
+            for hour, (working_minutes, booked_minutes) in enumerate(zip(working_hourly, booked_hourly)):
+                working[hour] += working_minutes
+                booked[hour] += booked_minutes
+
+        hours = [
+            {
+                'hour': f'{hour:02d}:00',
+                'working_minutes': working[hour],
+                'booked_minutes': booked[hour],
+                'utilization': self.utilization(working[hour], booked[hour]),
+            }
+            for hour in range(24) if working[hour]
+        ]
+        return Response({
+            'from': date_from.strftime('%d-%m-%Y'),
+            'to': date_to.strftime('%d-%m-%Y'),
+            'hours': hours,
+            'peak': [entry['hour'] for entry in sorted(hours, key=lambda entry: -entry['utilization'])[:3]],
+        }, status=status.HTTP_200_OK)
+
+
+class CompanyBookingExportAPIView(DateRangeMixin, generics.GenericAPIView):
+    """Stream the company's bookings, archived ones included, as CSV or NDJSON (?type=csv|ndjson).
+
+    Not ?format=, which DRF keeps for choosing a renderer.
+    """
+    permission_classes = [IsAdminUser]
+    queryset = Company.objects.all()
+    serializer_class = BookingExportRowSerializer
+    max_days = 3660
+    default_month = True
+
+    def get(self, request, *args, **kwargs):
+        date_from, date_to, error = self.get_range(request)
+        export_format = request.GET.get('type', 'csv')
+        if error is None and export_format not in export.FORMATS:
+            error = f"'type' must be one of {', '.join(export.FORMATS)}"
+        if error is not None:
+            return Response({'error': error}, status=status.HTTP_400_BAD_REQUEST)
+
+        company = self.get_object()
+        lines = export.lines(export_format, export.rows(company.pk, date_from, date_to))
+        content = export.achunks(lines) if isinstance(request._request, ASGIRequest) else export.chunks(lines)
+        response = StreamingHttpResponse(content, content_type=export.FORMATS[export_format])
+        response['Content-Disposition'] = (f'attachment; filename="bookings-{company.pk}-{date_from:%Y%m%d}-'
+                                           f'{date_to:%Y%m%d}.{export_format}"')
+        return response
+
+
+class RoomCalendarLinkAPIView(generics.GenericAPIView):
+    """The private iCalendar feed URL of a barber, for the barber themselves or an admin."""
+    permission_classes = [IsAuthenticated]
+    queryset = User.objects.filter(role='barber')
+    serializer_class = CalendarLinkSerializer
 
-        return availability_list
+    def get(self, request, *args, **kwargs):
+        barber = self.get_object()
+        if request.user.pk != barber.pk and not request.user.is_staff:
+            return Response({'error': 'You are not allowed to perform this action'}, status=status.HTTP_403_FORBIDDEN)
+        url = request.build_absolute_uri(reverse('RoomCalendar', args=[barber.pk]))
+        return Response({'url': f'{url}?token={calendar.token(barber.pk)}'}, status=status.HTTP_200_OK)
+
+
+class RoomCalendarFeedView(generics.GenericAPIView):
+    """iCalendar feed of a barber's bookings; calendar apps cannot send a JWT, so ?token= stands in for it."""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    # The feed is served from calendar.feed(); these only describe the endpoint in the schema.
+    queryset = User.objects.filter(role='barber')
+    serializer_class = CalendarFeedSerializer
+
+    def get(self, request, *args, **kwargs):
+        pk = self.kwargs.get('pk')
+        entry = None
+        if calendar.check_token(pk, request.GET.get('token')):
+            entry = calendar.feed(pk, request.get_host(), parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')))
+        if entry is None:
+            return Response({'error': 'Calendar not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        last_modified = entry['last_modified'] and int(entry['last_modified'].timestamp())
+        response = get_conditional_response(request, etag=entry['etag'], last_modified=last_modified)
+        if response is None:
+            response = HttpResponse(entry['body'], content_type='text/calendar; charset=utf-8')
+            response['Content-Disposition'] = f'inline; filename="barber-{pk}.ics"'
+        response['ETag'] = entry['etag']
+        if last_modified:
+            response['Last-Modified'] = http_date(last_modified)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+
+class AvailabilityCacheStatsAPIView(generics.GenericAPIView):
+    permission_classes = [IsAdminUser]
+    serializer_class = AvailabilityCacheStatsSerializer
+
+    def get(self, request, *args, **kwargs):
+        return Response(availability_cache.stats(), status=status.HTTP_200_OK)
 
 
 class RoomBookingAPIView(generics.CreateAPIView):
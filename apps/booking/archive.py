@@ -0,0 +1,55 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from apps.booking import cache, calendar
+from apps.booking.models import Booking, BookingArchive
+
+
+def default_cutoff():
+    return timezone.now() - timedelta(days=getattr(settings, 'BOOKING_ARCHIVE_AFTER_DAYS', 30))
+
+
+def archive_batch(cutoff, batch_size):
+    """Move up to ``batch_size`` bookings that ended before ``cutoff`` into BookingArchive; returns how many moved.
+
+    The bookings are deleted without Booking's per-row post_delete handlers, which would
+    run several queries per archived row. What those handlers do is either unneeded or
+    done here in bulk:
+
+    - daily occupancy is rebuilt from live and archived bookings alike, so it is unchanged;
+    - streams only follow upcoming availability, and these bookings are over;
+    - cached availability and calendar feeds of the affected barbers are dropped after the commit.
+    """
+    with transaction.atomic():
+        bookings = Booking.objects.filter(end__lt=cutoff).order_by('pk')
+        if connection.features.has_select_for_update:
+            bookings = bookings.select_for_update(skip_locked=connection.features.has_select_for_update_skip_locked)
+        rows = list(bookings.values(*BookingArchive.copied_fields)[:batch_size])
+        if not rows:
+            return 0
+        BookingArchive.objects.bulk_create(BookingArchive(**row) for row in rows)
+        Booking.objects.filter(pk__in=[row['id'] for row in rows])._raw_delete(Booking.objects.db)
+
+        days = defaultdict(set)
+        for row in rows:
+            days[row['room_id']].update(cache.booking_days(row['start'], row['end']))
+        for room_id, room_days in days.items():
+            cache.invalidate_on_commit(room_id, room_days)
+            calendar.invalidate_on_commit(room_id)
+    return len(rows)
+
+
+def archive_bookings(cutoff=None, batch_size=1000):
+    """Archive every booking that ended before ``cutoff``, one short transaction per batch.
+
+    Yields the running total after each batch, so callers can report progress.
+    """
+    cutoff = cutoff or default_cutoff()
+    total = 0
+    while moved := archive_batch(cutoff, batch_size):
+        total += moved
+        yield total
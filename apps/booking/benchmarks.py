@@ -0,0 +1,82 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import setup_databases, teardown_databases
+
+
+@contextmanager
+def isolated_database(verbosity=0, name=None):
+    """Run the block against freshly created test databases so seeding never touches real data.
+
+    ``name`` puts the default test database in that file instead of the one
+    DATABASES['default']['TEST'] names (a temporary file per process, see config/settings.py).
+    """
+    test_settings = connections[DEFAULT_DB_ALIAS].settings_dict.setdefault('TEST', {})
+    old_name = test_settings.get('NAME')
+    if name is not None:
+        test_settings['NAME'] = name
+    try:
+        old_config = setup_databases(verbosity=verbosity, interactive=False)
+        try:
+            yield
+        finally:
+            teardown_databases(old_config, verbosity=verbosity)
+    finally:
+        test_settings['NAME'] = old_name
+
+
+def percentiles(samples, points=(50, 95, 99)):
+    ordered = sorted(samples)
+    if not ordered:
+        return {f'p{point}': None for point in points}
+    result = {}
+    for point in points:
+        index = min(len(ordered) - 1, max(0, round(point / 100 * len(ordered)) - 1))
+        result[f'p{point}'] = ordered[index]
+    return result
+
+
+def timed(func, *args, **kwargs):
+    started = time.perf_counter()
+    result = func(*args, **kwargs)
+    return (time.perf_counter() - started) * 1000, result
+
+
+def summarize(samples):
+    summary = {
+        'count': len(samples),
+        'mean_ms': statistics.fmean(samples) if samples else None,
+    }
+    summary.update({f'{key}_ms': value for key, value in percentiles(samples).items()})
+    return summary
+
+
+def percentile_report(samples, errors, elapsed):
+    report = summarize(samples)
+    report['errors'] = errors
+    report['throughput_rps'] = len(samples) / elapsed if elapsed else None
+    return report
+
+
+def run_concurrently(request, count, concurrency):
+    """Call ``request(i)`` for i in range(count) from ``concurrency`` threads.
+
+    ``request`` returns True on success. Returns (latencies_ms, errors, elapsed_s).
+    """
+    outcomes = []
+
+    def work(worker):
+        try:
+            for i in range(worker, count, concurrency):
+                outcomes.append(timed(request, i))
+        finally:
+            connections.close_all()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(work, range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return [latency for latency, _ in outcomes], sum(1 for _, ok in outcomes if not ok), elapsed
@@ -0,0 +1,164 @@
+"""
+In-process fan-out of availability changes to Server-Sent Event streams.
+
+Booking writes report the (barber, day) pairs they touched through ``publish``.
+After the transaction commits, the broker re-reads each watched day once on the
+event loop and pushes the slot diff to every subscriber of that day. Nothing
+leaves the worker process, so no Redis is needed. The price is that a worker
+only hears about writes made in that worker. Each watched day is therefore also
+re-read every RESYNC_SECONDS, which picks up writes from other processes.
+"""
+import asyncio
+import contextvars
+from contextlib import asynccontextmanager
+from functools import partial
+
+from django.conf import settings
+from django.db import transaction
+
+
+def get_option(name, default):
+    return getattr(settings, 'AVAILABILITY_STREAM', {}).get(name, default)
+
+
+def spawn(coro):
+    """Run ``coro`` as a task outside any request context.
+
+    Topics outlive the request that created them. Inheriting its context would
+    tie their sync_to_async calls to that request's executor, which asgiref shuts
+    down when the response ends. With an empty context they share asgiref's
+    single thread instead.
+    """
+    return asyncio.get_running_loop().create_task(coro, context=contextvars.Context())
+
+
+def diff_slots(old, new):
+    old_keys = {(slot['start'], slot['end']) for slot in old}
+    new_keys = {(slot['start'], slot['end']) for slot in new}
+    return {
+        'added': [slot for slot in new if (slot['start'], slot['end']) not in old_keys],
+        'removed': [slot for slot in old if (slot['start'], slot['end']) not in new_keys],
+    }
+
+
+class Topic:
+    """The subscribers of one (barber, day) and the slots they were last sent."""
+
+    def __init__(self, load):
+        self.load = load
+        self.slots = None
+        self.version = 0
+        self.queues = set()
+        self.lock = asyncio.Lock()
+        self.pending = False
+        self.tasks = set()
+        self.resync = spawn(self.resync_forever())
+
+    def schedule_refresh(self):
+        # Changes arriving while a refresh is queued are covered by it.
+        if self.pending:
+            return
+        self.pending = True
+        task = spawn(self.refresh())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def refresh(self):
+        async with self.lock:
+            self.pending = False
+            slots = await spawn(self.load())
+            if self.slots is None:
+                self.slots = slots
+                return
+            changes = diff_slots(self.slots, slots)
+            if not changes['added'] and not changes['removed']:
+                return
+            self.slots = slots
+            self.version += 1
+            for queue in self.queues:
+                self.offer(queue, ('changes', self.version, changes))
+
+    def offer(self, queue, event):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # The client stopped reading: replace its backlog with the current state.
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(('snapshot', self.version, self.slots))
+
+    async def resync_forever(self):
+        while True:
+            await asyncio.sleep(get_option('RESYNC_SECONDS', 10))
+            self.schedule_refresh()
+
+    def close(self):
+        self.resync.cancel()
+        for task in self.tasks:
+            task.cancel()
+
+
+class Broker:
+    def __init__(self):
+        self.loop = None
+        self.topics = {}
+
+    def notify(self, room_id, days=None):
+        """Thread-safe: refresh the watched ``days`` of ``room_id`` (all of them when None)."""
+        loop = self.loop
+        if loop is None:
+            return
+        try:
+            loop.call_soon_threadsafe(self.changed, room_id, None if days is None else set(days),
+                                      context=contextvars.Context())
+        except RuntimeError:
+            # The loop has been closed since.
+            pass
+
+    def changed(self, room_id, days):
+        for (topic_room_id, day), topic in list(self.topics.items()):
+            if topic_room_id == room_id and (days is None or day in days):
+                topic.schedule_refresh()
+
+    @asynccontextmanager
+    async def subscribe(self, room_id, day, load):
+        """Yield ``(version, slots, queue)``: the current slots, then ``(kind, version, data)`` events on ``queue``.
+
+        ``load`` is a coroutine function returning the slots of ``room_id`` on ``day``.
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            if self.topics:
+                raise RuntimeError('The availability broker is bound to another event loop.')
+            self.loop = loop
+
+        key = (room_id, day)
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = Topic(load)
+        queue = asyncio.Queue(maxsize=get_option('QUEUE_SIZE', 100))
+        try:
+            async with topic.lock:
+                if topic.slots is None:
+                    topic.slots = await spawn(topic.load())
+                # Registered under the lock, so every diff this queue gets is relative to this snapshot.
+                topic.queues.add(queue)
+                version, slots = topic.version, topic.slots
+            yield version, slots, queue
+        finally:
+            topic.queues.discard(queue)
+            if not topic.queues:
+                if self.topics.get(key) is topic:
+                    del self.topics[key]
+                topic.close()
+            if not self.topics:
+                self.loop = None
+
+
+broker = Broker()
+
+
+def publish(room_id, days=None):
+    """Report changed days of a barber (all days when None) once the current transaction commits."""
+    if room_id is not None:
+        transaction.on_commit(partial(broker.notify, room_id, days))
@@ -0,0 +1,145 @@
+import time
+from datetime import timedelta
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.utils import timezone
+
+from apps.booking.schedule import cell_minutes
+from config.routers import use_primary
+
+HITS_KEY = 'availability:hits'
+MISSES_KEY = 'availability:misses'
+
+
+def get_cache():
+    return caches[getattr(settings, 'AVAILABILITY_CACHE_ALIAS', 'availability')]
+
+
+def _generation_key(room_id):
+    return f'availability:generation:{room_id}'
+
+
+def _generation(cache, room_id):
+    generation = cache.get(_generation_key(room_id))
+    if generation is None:
+        # Start from a fresh value rather than 0: if the counter was evicted,
+        # entries written under an older generation must stay unreachable.
+        cache.add(_generation_key(room_id), time.time_ns(), timeout=None)
+        generation = cache.get(_generation_key(room_id))
+    return generation
+
+
+def day_key(room_id, day, generation):
+    return f'availability:schedule:{cell_minutes()}:{room_id}:{generation}:{day.isoformat()}'
+
+
+def _count(cache, key, delta=1):
+    if not delta:
+        return
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key, delta)
+    except ValueError:
+        # The counter was evicted between add() and incr(); losing one tick is fine.
+        pass
+
+
+def lookup(room_id, days):
+    """``(keys, values)``: the cache key of each of ``days`` and the values already cached."""
+    cache = get_cache()
+    generation = _generation(cache, room_id)
+    keys = {day: day_key(room_id, day, generation) for day in days}
+    found = cache.get_many(keys.values())
+    values = {day: found[key] for day, key in keys.items() if key in found}
+    _count(cache, HITS_KEY, len(values))
+    _count(cache, MISSES_KEY, len(keys) - len(values))
+    return keys, values
+
+
+def get_many_or_compute(room_id, days, compute_many):
+    """Cached values of ``room_id`` for ``days``; ``compute_many(missing_days)`` returns a {day: value} dict."""
+    keys, values = lookup(room_id, days)
+    missing = [day for day in days if day not in values]
+    if missing:
+        # Entries outlive replica lag, so what is cached is read from the primary.
+        with use_primary():
+            computed = compute_many(missing)
+        get_cache().set_many({keys[day]: value for day, value in computed.items()})
+        values.update(computed)
+    return values
+
+
+async def aget_many_or_compute(room_id, days, compute_many):
+    """Async get_many_or_compute; ``compute_many`` is a coroutine function.
+
+    The bookkeeping of ``lookup`` runs in one thread hop rather than one per cache call.
+    """
+    keys, values = await sync_to_async(lookup)(room_id, days)
+    missing = [day for day in days if day not in values]
+    if missing:
+        with use_primary():
+            computed = await compute_many(missing)
+        await get_cache().aset_many({keys[day]: value for day, value in computed.items()})
+        values.update(computed)
+    return values
+
+
+def booking_days(start, end):
+    if start is None or end is None:
+        return []
+    first = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def invalidate_days(room_id, days):
+    if room_id is None or not days:
+        return
+    cache = get_cache()
+    generation = _generation(cache, room_id)
+    cache.delete_many([day_key(room_id, day, generation) for day in days])
+
+
+def invalidate_booking(booking):
+    invalidate_days(booking.room_id, booking_days(booking.start, booking.end))
+
+
+def invalidate_on_commit(room_id, days):
+    """invalidate_days once the current transaction commits.
+
+    Dropping the entries before the commit would let a concurrent reader cache the
+    rows as they were again, for the whole timeout.
+    """
+    if room_id is not None and days:
+        transaction.on_commit(partial(invalidate_days, room_id, list(days)))
+
+
+def invalidate_room(room_id):
+    """Drop every cached day of a barber at once, e.g. when their working hours change."""
+    try:
+        get_cache().incr(_generation_key(room_id))
+    except ValueError:
+        # No generation stored means the next read starts a fresh one anyway.
+        pass
+
+
+def invalidate_room_on_commit(room_id):
+    transaction.on_commit(partial(invalidate_room, room_id))
+
+
+def stats():
+    cache = get_cache()
+    counters = cache.get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': hits / total if total else None,
+        'backend': f'{type(cache).__module__}.{type(cache).__name__}',
+    }
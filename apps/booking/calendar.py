@@ -0,0 +1,167 @@
+"""
+Per-barber iCalendar feeds.
+
+Calendar apps poll feeds every few minutes without a JWT, so a feed is addressed by
+the barber id plus a signed token, and the rendered body is cached together with its
+validators. A poll whose ETag still matches is answered from the cache alone; booking
+signals drop the entry, and the next poll renders it again.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.signing import Signer
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+from apps.account.models import User
+from apps.booking.cache import get_cache
+from apps.booking.models import Booking
+from config.routers import use_primary
+
+SIGNER = Signer(salt='apps.booking.calendar')
+
+
+def get_option(name):
+    return settings.CALENDAR_FEED[name]
+
+
+def token(barber_id):
+    return SIGNER.signature(str(barber_id))
+
+
+def check_token(barber_id, value):
+    return constant_time_compare(token(barber_id), value or '')
+
+
+def cache_key(barber_id, today):
+    # The window moves with the date, so yesterday's entries simply stop being read.
+    return f'calendar:{barber_id}:{today.isoformat()}'
+
+
+def invalidate(barber_id):
+    if barber_id is not None:
+        get_cache().delete(cache_key(barber_id, timezone.localdate()))
+
+
+def invalidate_on_commit(barber_id):
+    # After the commit, so that a poll racing the write cannot cache the feed as it was.
+    if barber_id is not None:
+        transaction.on_commit(partial(invalidate, barber_id))
+
+
+def window(today):
+    return today - timedelta(days=get_option('PAST_DAYS')), today + timedelta(days=get_option('FUTURE_DAYS'))
+
+
+def bookings(barber_id, today):
+    first, last = window(today)
+    return Booking.objects.filter(
+        room_id=barber_id,
+        start__gte=timezone.make_aware(datetime.combine(first, time.min)),
+        start__lt=timezone.make_aware(datetime.combine(last + timedelta(days=1), time.min)),
+    )
+
+
+def make_etag(barber_id, today, count, last_modified):
+    # Max(updated_at) moves on every change but a delete; the count catches those.
+    digest = hashlib.md5(f'{barber_id}:{today}:{count}:{last_modified}'.encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def validators(barber_id, today):
+    """``(etag, last_modified)`` of the feed, without reading the bookings themselves."""
+    summary = bookings(barber_id, today).aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return make_etag(barber_id, today, summary['count'], summary['last_modified']), summary['last_modified']
+
+
+def escape(value):
+    return (str(value).replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+            .replace('\r\n', '\\n').replace('\n', '\\n'))
+
+
+def fold(line):
+    """Split a content line into 75-octet pieces (RFC 5545, 3.1)."""
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line
+    pieces, piece = [], b''
+    for char in line:
+        size = 75 if not pieces else 74
+        if len(piece) + len(char.encode()) > size:
+            pieces.append(piece.decode())
+            piece = b''
+        piece += char.encode()
+    pieces.append(piece.decode())
+    return '\r\n '.join(pieces)
+
+
+def stamp(value):
+    return value.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def render(barber_id, today, host):
+    """``(etag, last_modified, body)``, validators and body read from the same rows; None for no such barber."""
+    barber = User.objects.filter(pk=barber_id, role='barber').first()
+    if barber is None:
+        return None
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//Booking//Barber calendar//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        f'X-WR-CALNAME:{escape(barber.get_full_name() or barber.username)}',
+        f'REFRESH-INTERVAL;VALUE=DURATION:PT{get_option("REFRESH_MINUTES")}M',
+        f'X-PUBLISHED-TTL:PT{get_option("REFRESH_MINUTES")}M',
+    ]
+    rows = list(bookings(barber.pk, today).select_related('resident').order_by('start', 'id'))
+    for booking in rows:
+        resident = booking.resident
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:booking-{booking.pk}@{host}',
+            f'DTSTAMP:{stamp(booking.updated_at)}',
+            f'LAST-MODIFIED:{stamp(booking.updated_at)}',
+            f'DTSTART:{stamp(booking.start)}',
+            f'DTEND:{stamp(booking.end)}',
+            f'SUMMARY:{escape(resident.get_full_name() or resident.username) if resident else "Booking"}',
+            f'STATUS:{"CONFIRMED" if booking.is_active else "CANCELLED"}',
+            'END:VEVENT',
+        ]
+        if resident is not None and resident.phone_number:
+            lines.insert(-1, f'DESCRIPTION:{escape(resident.phone_number)}')
+    lines.append('END:VCALENDAR')
+    last_modified = max((booking.updated_at for booking in rows), default=None)
+    body = ''.join(fold(line) + '\r\n' for line in lines)
+    return make_etag(barber.pk, today, len(rows), last_modified), last_modified, body
+
+
+def feed(barber_id, host, client_etags=()):
+    """The cached ``{'etag', 'last_modified', 'body'}`` of the barber's feed, None if they do not exist.
+
+    ``body`` stays None while every client asking has the current ``etag``: a 304 needs
+    only the validators, so the feed is rendered the first time someone lacks it.
+    """
+    cache = get_cache()
+    today = timezone.localdate()
+    key = cache_key(barber_id, today)
+    entry = cache.get(key)
+    if entry is not None and (entry['body'] is not None or entry['etag'] in client_etags):
+        return entry
+    # The entry is kept until the next change, so it is read from the primary, not a lagging replica.
+    with use_primary():
+        if entry is None and client_etags:
+            etag, last_modified = validators(barber_id, today)
+            entry = {'etag': etag, 'last_modified': last_modified, 'body': None}
+        if entry is None or entry['etag'] not in client_etags:
+            rendered = render(barber_id, today, host)
+            if rendered is None:
+                return None
+            etag, last_modified, body = rendered
+            entry = {'etag': etag, 'last_modified': last_modified, 'body': body}
+    cache.set(key, entry, get_option('CACHE_TIMEOUT'))
+    return entry
@@ -0,0 +1,47 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from apps.booking.archive import archive_bookings, default_cutoff
+from apps.booking.models import Booking
+
+
+class Command(BaseCommand):
+    help = ("Move bookings that ended before the cutoff (BOOKING_ARCHIVE_AFTER_DAYS ago by default) into the "
+            "archive table in batches. Safe to run repeatedly, e.g. nightly from cron.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Cutoff date in dd-mm-YYYY format (local midnight).')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the bookings that would move.')
+        parser.add_argument('--vacuum', action='store_true',
+                            help='Reclaim the freed space afterwards (VACUUM on SQLite, VACUUM ANALYZE on PostgreSQL).')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                day = datetime.strptime(options['before'], '%d-%m-%Y').date()
+            except ValueError:
+                raise CommandError('--before must be in dd-mm-YYYY format')
+            cutoff = timezone.make_aware(datetime.combine(day, time.min))
+        else:
+            cutoff = default_cutoff()
+
+        if options['dry_run']:
+            count = Booking.objects.filter(end__lt=cutoff).count()
+            self.stdout.write(f'{count} bookings ended before {timezone.localtime(cutoff):%d-%m-%Y %H:%M} and would be archived.')
+            return
+
+        total = 0
+        for total in archive_bookings(cutoff, options['batch_size']):
+            self.stderr.write(f'archived {total}...')
+        self.stdout.write(f'Archived {total} bookings that ended before {timezone.localtime(cutoff):%d-%m-%Y %H:%M}.')
+
+        if options['vacuum'] and total:
+            with connection.cursor() as cursor:
+                if connection.vendor == 'sqlite':
+                    cursor.execute('VACUUM')
+                elif connection.vendor == 'postgresql':
+                    cursor.execute(f'VACUUM ANALYZE {Booking._meta.db_table}')
@@ -0,0 +1,178 @@
+import json
+import logging
+import os
+import platform
+import random
+import tempfile
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+import django
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.utils import timezone
+
+from apps.account.models import User, Company
+from apps.booking.benchmarks import isolated_database, percentile_report, run_concurrently
+from apps.booking.models import Booking
+
+PASSWORD = 'bench-password'
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = ("Seed a throwaway database with a realistic dataset and drive the API endpoints concurrently, "
+            "reporting p50/p95/p99 latency and throughput per scenario as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--companies', type=int, default=200)
+        parser.add_argument('--barbers-per-company', type=int, default=5)
+        parser.add_argument('--residents', type=int, default=500)
+        parser.add_argument('--bookings-per-barber', type=int, default=200,
+                            help='History per barber; 2000 companies x 5 barbers x 200 gives 2M bookings.')
+        parser.add_argument('--requests', type=int, default=500, help='Requests per scenario.')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--scenarios', default='',
+                            help='Comma separated subset of scenarios to run (default: all).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout.')
+
+    def handle(self, *args, **options):
+        # One log line per (slow) request would drown the report.
+        logging.getLogger('config.instrumentation').setLevel(logging.ERROR)
+        self.seed_value = options['seed']
+
+        with tempfile.TemporaryDirectory() as directory, \
+                isolated_database(name=os.path.join(directory, 'benchmark.sqlite3')):
+            dataset = self.seed(options)
+            scenarios = self.scenarios(dataset)
+            selected = [name for name in options['scenarios'].split(',') if name] or list(scenarios)
+
+            results = {}
+            for name in selected:
+                self.stderr.write(f'running {name}...')
+                latencies, errors, elapsed = run_concurrently(
+                    scenarios[name], options['requests'], options['concurrency']
+                )
+                results[name] = percentile_report(latencies, errors, elapsed)
+
+        report = {
+            'meta': {
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'concurrency': options['concurrency'],
+                'requests_per_scenario': options['requests'],
+                'dataset': dataset['counts'],
+            },
+            'scenarios': results,
+        }
+        output = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
+
+    def seed(self, options):
+        batch_size = options['batch_size']
+        self.stderr.write('seeding companies and users...')
+        Company.objects.bulk_create(
+            (Company(name=f'company-{i}', address=f'street {i}') for i in range(options['companies'])),
+            batch_size=batch_size,
+        )
+        company_ids = list(Company.objects.values_list('id', flat=True))
+
+        User.objects.bulk_create(
+            (User(username=f'barber-{company_id}-{i}', role='barber', company_id=company_id, password='!',
+                  start=time(9), end=time(18), break_start=time(13), break_end=time(14))
+             for company_id in company_ids for i in range(options['barbers_per_company'])),
+            batch_size=batch_size,
+        )
+        # Hash once: every resident shares the password so token obtain can be driven.
+        password = make_password(PASSWORD)
+        User.objects.bulk_create(
+            (User(username=f'resident-{i}', role='user', password=password) for i in range(options['residents'])),
+            batch_size=batch_size,
+        )
+        barbers = list(User.objects.filter(role='barber').values_list('id', 'company_id'))
+        residents = list(User.objects.filter(role='user').order_by('id'))
+
+        self.stderr.write('seeding bookings...')
+        today = timezone.make_aware(datetime.combine(timezone.localdate(), time(9)))
+        per_day = 8
+
+        def bookings():
+            for barber_id, _ in barbers:
+                for i in range(options['bookings_per_barber']):
+                    # Walk backwards from today: hourly slots, 8 per working day.
+                    start = today - timedelta(days=i // per_day) + timedelta(hours=i % per_day)
+                    yield Booking(room_id=barber_id, resident_id=residents[i % len(residents)].pk,
+                                  start=start, end=start + timedelta(minutes=30))
+
+        total = 0
+        for batch in batched(bookings(), batch_size):
+            Booking.objects.bulk_create(batch)
+            total += len(batch)
+
+        return {
+            'today': today,
+            'company_ids': company_ids,
+            'barbers': barbers,
+            'residents': residents,
+            'tokens': [resident.tokens['access'] for resident in residents[:50]],
+            'counts': {
+                'companies': len(company_ids),
+                'barbers': len(barbers),
+                'residents': len(residents),
+                'bookings': total,
+            },
+        }
+
+    def scenarios(self, dataset):
+        seed = self.seed_value
+        tokens, barbers, residents = dataset['tokens'], dataset['barbers'], dataset['residents']
+        today = dataset['today']
+        date = today.strftime('%d-%m-%Y')
+
+        def rng(i):
+            # Seeded per request rather than shared: Random is not thread safe, and a shared one
+            # hands out numbers in whatever order the threads happen to run.
+            return random.Random(seed + i)
+
+        def get(path, i):
+            return Client().get(path, HTTP_AUTHORIZATION=f'Bearer {tokens[i % len(tokens)]}').status_code == 200
+
+        def token_obtain(i):
+            response = Client().post('/api/token/', {
+                'username': residents[i % len(residents)].username, 'password': PASSWORD,
+            }, content_type='application/json')
+            return response.status_code == 200
+
+        def booking_create(i):
+            # Each request gets its own future slot, so every create is expected to succeed.
+            barber_id, _ = barbers[i % len(barbers)]
+            start = today + timedelta(days=1 + i // len(barbers), minutes=rng(i).randrange(0, 8) * 60)
+            response = Client().post('/api/v1/Booking/', {
+                'room': barber_id, 'start': start.isoformat(), 'end': (start + timedelta(minutes=30)).isoformat(),
+            }, content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {tokens[i % len(tokens)]}')
+            return response.status_code == 201
+
+        return {
+            'token_obtain': token_obtain,
+            'booking_create': booking_create,
+            'booking_list': lambda i: get('/api/v1/Bookings/', i),
+            'availability': lambda i: get(f'/api/v1/Room/{rng(i).choice(barbers)[0]}/Availability/?date={date}', i),
+            'availability_range': lambda i: get(
+                f'/api/v1/Room/{rng(i).choice(barbers)[0]}/Availability/Range/?from={date}'
+                f'&to={(today + timedelta(days=13)).strftime("%d-%m-%Y")}', i),
+            'company_availability': lambda i: get(
+                f'/api/v1/Company/{rng(i).choice(dataset["company_ids"])}/Availability/?date={date}', i),
+            'company_list': lambda i: get('/api/v1/Companies/', i),
+        }
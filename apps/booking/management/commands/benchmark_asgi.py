@@ -0,0 +1,199 @@
+import asyncio
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, time as day_time, timedelta
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.booking.benchmarks import isolated_database, percentile_report
+from apps.booking.models import Booking
+
+
+@contextmanager
+def peak_threads(interval=0.005):
+    """Track the highest number of live threads while the block runs; yields a one-item list."""
+    peak = [threading.active_count()]
+    done = threading.Event()
+
+    def sample():
+        while not done.wait(interval):
+            peak[0] = max(peak[0], threading.active_count())
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        yield peak
+    finally:
+        done.set()
+        sampler.join()
+        # The sampler itself is not serving anything.
+        peak[0] -= 1
+
+
+class Command(BaseCommand):
+    help = ("Compare how many concurrent slow clients the WSGI path (sync views on a fixed thread pool, as under "
+            "gunicorn --threads) and the ASGI path (async views on one event loop, as under one uvicorn worker) "
+            "serve. Both Django handlers are driven in-process; every client takes --client-delay ms to read "
+            "each response.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=100)
+        parser.add_argument('--requests-per-client', type=int, default=5)
+        parser.add_argument('--client-delay', type=float, default=100, help='Milliseconds to read a response.')
+        parser.add_argument('--threads', type=int, default=8, help='WSGI worker threads.')
+        parser.add_argument('--barbers', type=int, default=20)
+
+    def handle(self, *args, **options):
+        logging.getLogger('config.instrumentation').setLevel(logging.ERROR)
+        with tempfile.TemporaryDirectory() as directory, \
+                isolated_database(name=os.path.join(directory, 'benchmark.sqlite3')):
+            requests = self.seed(options)
+            results = {}
+            self.stderr.write('running wsgi...')
+            results['wsgi'] = self.run_wsgi(requests(async_views=False), options)
+            self.stderr.write('running asgi...')
+            results['asgi'] = self.run_asgi(requests(async_views=True), options)
+
+        self.stdout.write(json.dumps({
+            'meta': {key: options[key] for key in ('clients', 'requests_per_client', 'client_delay', 'threads')},
+            'modes': results,
+        }, indent=2, sort_keys=True))
+
+    def seed(self, options):
+        User.objects.bulk_create(
+            User(username=f'barber-{i}', role='barber', password='!', start=day_time(9), end=day_time(18),
+                 break_start=day_time(13), break_end=day_time(14))
+            for i in range(options['barbers'])
+        )
+        User.objects.bulk_create(
+            User(username=f'resident-{i}', role='user', password='!') for i in range(options['clients'])
+        )
+        barbers = list(User.objects.filter(role='barber').values_list('id', flat=True))
+        residents = list(User.objects.filter(role='user'))
+        day = timezone.make_aware(datetime.combine(timezone.localdate(), day_time(9)))
+        Booking.objects.bulk_create(
+            Booking(room_id=barber, resident=resident, start=day + timedelta(hours=hour),
+                    end=day + timedelta(hours=hour, minutes=30))
+            for barber, resident in zip(barbers * len(residents), residents) for hour in range(0, 8, 2)
+        )
+        tokens = [f'Bearer {resident.tokens["access"]}' for resident in residents]
+        date = day.strftime('%d-%m-%Y')
+
+        def requests(async_views):
+            prefix = '/api/v1/Async/' if async_views else '/api/v1/'
+            paths = [
+                (f'{prefix}Room/{{barber}}/Availability/', f'date={date}'),
+                (f'{prefix}Bookings/', ''),
+                (f'{prefix}Profile/', ''),
+            ]
+            # One list of (path, query, authorization) per client.
+            return [
+                [
+                    (path.format(barber=barbers[(client + i) % len(barbers)]), query, tokens[client])
+                    for i in range(options['requests_per_client'])
+                    for path, query in [paths[(client + i) % len(paths)]]
+                ]
+                for client in range(options['clients'])
+            ]
+
+        return requests
+
+    def run_wsgi(self, clients, options):
+        handler = WSGIHandler()
+        delay = options['client_delay'] / 1000
+        outcomes = []
+
+        def request(path, query, authorization):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query, 'SCRIPT_NAME': '',
+                'SERVER_NAME': 'testserver', 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'HTTP_HOST': 'testserver', 'HTTP_AUTHORIZATION': authorization,
+                'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+                'wsgi.errors': sys.stderr, 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            statuses = []
+            result = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                for _ in result:
+                    # A synchronous worker writes the body itself, so the slow read holds its thread.
+                    time.sleep(delay)
+            finally:
+                result.close()
+            return statuses[0].startswith('200')
+
+        def client(requests, arrived):
+            for path, query, authorization in requests:
+                ok = request(path, query, authorization)
+                outcomes.append(((time.perf_counter() - arrived) * 1000, ok))
+                arrived = time.perf_counter()
+
+        with peak_threads() as peak:
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+                list(pool.map(client, clients, [started] * len(clients)))
+            elapsed = time.perf_counter() - started
+        return self.report(outcomes, elapsed, peak[0])
+
+    def run_asgi(self, clients, options):
+        handler = ASGIHandler()
+        delay = options['client_delay'] / 1000
+        outcomes = []
+
+        async def request(path, query, authorization):
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': [(b'host', b'testserver'), (b'authorization', authorization.encode())],
+                'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+            }
+            messages = iter([{'type': 'http.request', 'body': b'', 'more_body': False}])
+            statuses = []
+
+            async def receive():
+                return next(messages, {'type': 'http.disconnect'})
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif message['type'] == 'http.response.body':
+                    # The event loop serves other requests while this client reads.
+                    await asyncio.sleep(delay)
+
+            await handler(scope, receive, send)
+            return statuses[0] == 200
+
+        async def client(requests, arrived):
+            for path, query, authorization in requests:
+                ok = await request(path, query, authorization)
+                outcomes.append(((time.perf_counter() - arrived) * 1000, ok))
+                arrived = time.perf_counter()
+
+        async def main():
+            started = time.perf_counter()
+            await asyncio.gather(*(client(requests, started) for requests in clients))
+            return time.perf_counter() - started
+
+        with peak_threads() as peak:
+            elapsed = asyncio.run(main())
+        return self.report(outcomes, elapsed, peak[0])
+
+    @staticmethod
+    def report(outcomes, elapsed, threads):
+        report = percentile_report(
+            [latency for latency, _ in outcomes], sum(1 for _, ok in outcomes if not ok), elapsed
+        )
+        report['peak_threads'] = threads
+        return report
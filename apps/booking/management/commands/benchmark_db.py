@@ -0,0 +1,130 @@
+import json
+import logging
+import os
+import random
+import tempfile
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.booking.benchmarks import isolated_database, percentile_report, run_concurrently
+
+# What config/settings_production.py turns on, without the environment lookups.
+PROFILES = {
+    'default': {
+        'database': {'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False, 'OPTIONS': {}},
+        'pragmas': {},
+    },
+    'production': {
+        'database': {'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'OPTIONS': {'timeout': 20}},
+        'pragmas': {'journal_mode': 'WAL', 'synchronous': 'NORMAL', 'cache_size': -20000, 'temp_store': 'MEMORY'},
+    },
+}
+
+
+class Command(BaseCommand):
+    help = ("Drive a mixed read/write API load (availability and booking list reads, booking creates) "
+            "against a file-backed SQLite database once per connection profile and report throughput, "
+            "latency, failed requests and connections opened as JSON.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='default,production')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--write-ratio', type=float, default=0.2)
+        parser.add_argument('--barbers', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        logging.getLogger('config.instrumentation').setLevel(logging.ERROR)
+        # "database is locked" failures are counted, not logged one by one.
+        logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        results = {}
+        for name in options['profiles'].split(','):
+            self.stderr.write(f'running {name}...')
+            results[name] = self.run_profile(PROFILES[name], options)
+        self.stdout.write(json.dumps({
+            'meta': {key: options[key] for key in ('requests', 'concurrency', 'write_ratio', 'barbers')},
+            'profiles': results,
+        }, indent=2, sort_keys=True))
+
+    def run_profile(self, profile, options):
+        settings_dict = connections[DEFAULT_DB_ALIAS].settings_dict
+        saved = {key: settings_dict.get(key) for key in profile['database']}
+        opened = []
+
+        def count(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        settings_dict.update(profile['database'])
+        try:
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(SQLITE_PRAGMAS=profile['pragmas']), \
+                    isolated_database(name=os.path.join(directory, 'benchmark.sqlite3')):
+                request = self.workload(options)
+                connections.close_all()
+                connection_created.connect(count, dispatch_uid='benchmark_db_count')
+                try:
+                    latencies, errors, elapsed = run_concurrently(
+                        request, options['requests'], options['concurrency']
+                    )
+                finally:
+                    connection_created.disconnect(dispatch_uid='benchmark_db_count')
+        finally:
+            settings_dict.update(saved)
+
+        report = percentile_report(latencies, errors, elapsed)
+        report['connections_opened'] = len(opened)
+        report['journal_mode'] = profile['pragmas'].get('journal_mode', 'delete').lower()
+        return report
+
+    def workload(self, options):
+        rng = random.Random(options['seed'])
+        User.objects.bulk_create(
+            User(username=f'barber-{i}', role='barber', password='!',
+                 start=time(9), end=time(18), break_start=time(13), break_end=time(14))
+            for i in range(options['barbers'])
+        )
+        User.objects.bulk_create(
+            User(username=f'resident-{i}', role='user', password='!') for i in range(options['concurrency'])
+        )
+        residents = list(User.objects.filter(role='user'))
+        barbers = list(User.objects.filter(role='barber').values_list('id', flat=True))
+        tokens = [resident.tokens['access'] for resident in residents]
+        day = timezone.make_aware(datetime.combine(timezone.localdate() + timedelta(days=1), time(9)))
+        date = day.strftime('%d-%m-%Y')
+        kinds = [rng.random() < options['write_ratio'] for _ in range(options['requests'])]
+        slots = [rng.randrange(36) for _ in range(options['requests'])]
+
+        def request(i):
+            # The test client disconnects close_old_connections from request_started/finished;
+            # call it like the WSGI handler does so CONN_MAX_AGE takes effect.
+            close_old_connections()
+            try:
+                return send(i)
+            finally:
+                close_old_connections()
+
+        def send(i):
+            client = Client(raise_request_exception=False,
+                            HTTP_AUTHORIZATION=f'Bearer {tokens[i % len(tokens)]}')
+            barber = barbers[i % len(barbers)]
+            if kinds[i]:
+                start = day + timedelta(minutes=15 * slots[i])
+                response = client.post('/api/v1/Booking/', {
+                    'room': barber, 'start': start.isoformat(), 'end': (start + timedelta(minutes=15)).isoformat(),
+                }, content_type='application/json')
+                # 400 is a legitimate overlap rejection; anything else (500: database is locked) failed.
+                return response.status_code in (201, 400)
+            if i % 2:
+                return client.get(f'/api/v1/Room/{barber}/Availability/?date={date}').status_code == 200
+            return client.get('/api/v1/Bookings/').status_code == 200
+
+        return request
@@ -0,0 +1,69 @@
+import json
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.account.models import User
+from apps.booking.benchmarks import isolated_database, summarize, timed
+from apps.booking.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Measure booking create latency while one barber's booking history grows."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='0,1000,10000,100000',
+                            help='Comma separated history sizes to measure at.')
+        parser.add_argument('--samples', type=int, default=200, help='Creates timed per history size.')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--json', action='store_true', help='Print machine-readable output.')
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        with isolated_database():
+            results = self.run(sizes, options['samples'], options['batch_size'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+        self.stdout.write(f"{'history':>10} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+        for row in results:
+            self.stdout.write(
+                f"{row['history']:>10} {row['mean_ms']:>9.2f} {row['p50_ms']:>9.2f} "
+                f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f}"
+            )
+
+    def run(self, sizes, samples, batch_size):
+        barber = User.objects.create_user(username='bench-barber', password='bench', role='barber')
+        resident = User.objects.create_user(username='bench-resident', password='bench')
+        client = APIClient()
+        client.force_authenticate(resident)
+
+        # History lives in the past, timed creates go into the future, so nothing collides.
+        origin = timezone.now().replace(minute=0, second=0, microsecond=0)
+        slot = timedelta(minutes=30)
+        seeded = 0
+        future = origin + timedelta(days=1)
+        results = []
+        for size in sizes:
+            while seeded < size:
+                count = min(batch_size, size - seeded)
+                Booking.objects.bulk_create(
+                    Booking(room=barber, resident=resident,
+                            start=origin - (seeded + i + 1) * slot, end=origin - (seeded + i) * slot)
+                    for i in range(count)
+                )
+                seeded += count
+
+            timings = []
+            for _ in range(samples):
+                payload = {'room': barber.pk, 'start': future.isoformat(), 'end': (future + slot).isoformat()}
+                elapsed, response = timed(client.post, '/api/v1/Booking/', payload, format='json')
+                if response.status_code != 201:
+                    raise RuntimeError(f'Unexpected response {response.status_code}: {response.content!r}')
+                timings.append(elapsed)
+                future += slot
+            results.append({'history': size, **summarize(timings)})
+        return results
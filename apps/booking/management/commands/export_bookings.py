@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.account.models import Company
+from apps.booking import export
+
+
+class Command(BaseCommand):
+    help = "Stream a company's bookings, archived ones included, as CSV or NDJSON to stdout or a file."
+
+    def add_arguments(self, parser):
+        parser.add_argument('company', type=int, help='Company id.')
+        parser.add_argument('--from', dest='date_from', required=True, help='First day, dd-mm-YYYY.')
+        parser.add_argument('--to', dest='date_to', required=True, help='Last day, dd-mm-YYYY.')
+        parser.add_argument('--format', dest='export_format', choices=list(export.FORMATS), default='csv')
+        parser.add_argument('--output', help='File to write; stdout by default.')
+
+    def handle(self, *args, **options):
+        try:
+            date_from = datetime.strptime(options['date_from'], '%d-%m-%Y').date()
+            date_to = datetime.strptime(options['date_to'], '%d-%m-%Y').date()
+        except ValueError:
+            raise CommandError('Dates must be in dd-mm-YYYY format')
+        if date_to < date_from:
+            raise CommandError('--to cannot be before --from')
+        if not Company.objects.filter(pk=options['company']).exists():
+            raise CommandError(f"Company {options['company']} does not exist")
+
+        rows = export.rows(options['company'], date_from, date_to)
+        chunks = export.chunks(export.lines(options['export_format'], rows))
+        if options['output']:
+            with open(options['output'], 'w', newline='', encoding='utf-8') as out:
+                for chunk in chunks:
+                    out.write(chunk)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending='')
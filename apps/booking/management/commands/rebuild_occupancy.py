@@ -0,0 +1,46 @@
+from datetime import datetime, timedelta
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.booking.occupancy import rebuild
+
+
+class Command(BaseCommand):
+    help = ("Recompute DailyOccupancy for every barber and day of a range (default: the last 30 and next 30 days). "
+            "Run it nightly: it also adds rows for days nobody booked yet.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day, dd-mm-YYYY.')
+        parser.add_argument('--to', dest='date_to', help='Last day, dd-mm-YYYY.')
+        parser.add_argument('--company', type=int, help='Only the barbers of this company.')
+        parser.add_argument('--batch-size', type=int, default=100, help='Barbers recomputed per pair of queries.')
+
+    def handle(self, *args, **options):
+        today = timezone.localdate()
+        try:
+            date_from = datetime.strptime(options['date_from'], '%d-%m-%Y').date() if options['date_from'] \
+                else today - timedelta(days=30)
+            date_to = datetime.strptime(options['date_to'], '%d-%m-%Y').date() if options['date_to'] \
+                else today + timedelta(days=30)
+        except ValueError:
+            raise CommandError('Dates must be in dd-mm-YYYY format')
+        if date_to < date_from:
+            raise CommandError('--to cannot be before --from')
+
+        barbers = User.objects.filter(role='barber').order_by('pk')
+        if options['company']:
+            barbers = barbers.filter(company_id=options['company'])
+        days = [date_from + timedelta(days=offset) for offset in range((date_to - date_from).days + 1)]
+
+        rows = 0
+        # A month of days at a time keeps each booking window query bounded.
+        month_chunks = [days[i:i + 31] for i in range(0, len(days), 31)]
+        iterator = barbers.iterator(chunk_size=options['batch_size'])
+        while batch := list(islice(iterator, options['batch_size'])):
+            for chunk in month_chunks:
+                rows += rebuild(batch, chunk)
+            self.stderr.write(f'{rows} rows...')
+        self.stdout.write(f'Rebuilt {rows} occupancy rows from {date_from:%d-%m-%Y} to {date_to:%d-%m-%Y}.')
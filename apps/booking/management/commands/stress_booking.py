@@ -0,0 +1,93 @@
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.booking.benchmarks import summarize
+from apps.booking.models import Booking
+from apps.booking.stress import post_bookings
+
+
+class Command(BaseCommand):
+    help = ("Fire concurrent POST /api/v1/Booking/ requests from several processes at a running server, "
+            "then assert that no two active bookings of a barber overlap.")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', default='http://127.0.0.1:8000', help='Base URL of the running server.')
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--barbers', type=int, default=4)
+        parser.add_argument('--slots', type=int, default=48,
+                            help='Candidate 15 minute start slots per barber; fewer slots means more contention.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--json', action='store_true', help='Print machine-readable output.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        barbers, tokens = self.seed(options['barbers'], options['processes'])
+
+        day = timezone.now().replace(hour=9, minute=0, second=0, microsecond=0) + timedelta(days=1)
+        jobs = []
+        for i in range(options['requests']):
+            start = day + timedelta(minutes=15 * rng.randrange(options['slots']))
+            end = start + timedelta(minutes=rng.choice((15, 30, 45)))
+            payload = {'room': rng.choice(barbers).pk, 'start': start.isoformat(), 'end': end.isoformat()}
+            jobs.append((tokens[i % len(tokens)], payload))
+
+        url = options['url'].rstrip('/') + '/api/v1/Booking/'
+        chunks = [jobs[i::options['processes']] for i in range(options['processes'])]
+        started = time.perf_counter()
+        with ProcessPoolExecutor(max_workers=options['processes']) as pool:
+            outcomes = [item for chunk in pool.map(post_bookings, [url] * len(chunks), chunks) for item in chunk]
+        elapsed = time.perf_counter() - started
+
+        statuses = [status for status, _ in outcomes]
+        overlaps = self.find_overlaps(barbers)
+        report = {
+            'requests': len(outcomes),
+            'created': statuses.count(201),
+            'rejected': statuses.count(400),
+            'errors': len(statuses) - statuses.count(201) - statuses.count(400),
+            'overlaps': len(overlaps),
+            'elapsed_s': elapsed,
+            'throughput_rps': len(outcomes) / elapsed if elapsed else None,
+            'latency': summarize([latency for _, latency in outcomes]),
+        }
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            for key, value in report.items():
+                self.stdout.write(f'{key:>15}: {value}')
+        if overlaps:
+            raise CommandError(f'{len(overlaps)} overlapping booking pairs, e.g. {overlaps[:5]}')
+
+    @staticmethod
+    def seed(barber_count, resident_count):
+        barbers = []
+        for i in range(barber_count):
+            barber, _ = User.objects.get_or_create(username=f'stress-barber-{i}', defaults={'role': 'barber'})
+            barbers.append(barber)
+        Booking.objects.filter(room__in=barbers).delete()
+
+        tokens = []
+        for i in range(resident_count):
+            resident, _ = User.objects.get_or_create(username=f'stress-resident-{i}')
+            tokens.append(resident.tokens['access'])
+        return barbers, tokens
+
+    @staticmethod
+    def find_overlaps(barbers):
+        overlaps = []
+        for barber in barbers:
+            previous = None
+            for booking in Booking.objects.active().filter(room=barber).order_by('start'):
+                if previous is not None and booking.start < previous.end:
+                    overlaps.append((previous.pk, booking.pk))
+                if previous is None or booking.end > previous.end:
+                    previous = booking
+        return overlaps
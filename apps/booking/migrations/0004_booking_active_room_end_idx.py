@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0003_alter_booking_room'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(condition=models.Q(('is_active', True)), fields=['room', 'end', 'start'], name='booking_active_room_end_idx'),
+        ),
+    ]
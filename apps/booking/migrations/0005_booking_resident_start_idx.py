@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 20:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0004_booking_active_room_end_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['resident', 'start'], name='booking_resident_start_idx'),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('account', '0004_user_avatar_variants'),
+        ('booking', '0006_bookingarchive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('working_minutes', models.PositiveIntegerField(default=0)),
+                ('booked_minutes', models.PositiveIntegerField(default=0)),
+                ('bookings', models.PositiveIntegerField(default=0)),
+                ('working_hourly', models.JSONField(default=list)),
+                ('booked_hourly', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('barber', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_occupancy', to=settings.AUTH_USER_MODEL)),
+                ('company', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='daily_occupancy', to='account.company')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['company', 'day'], name='occupancy_company_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='dailyoccupancy',
+            constraint=models.UniqueConstraint(fields=('barber', 'day'), name='occupancy_barber_day_uniq'),
+        ),
+    ]
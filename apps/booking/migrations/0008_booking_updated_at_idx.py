@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0007_dailyoccupancy'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['updated_at'], name='booking_updated_at_idx'),
+        ),
+    ]
@@ -6,6 +6,15 @@ from apps.account.models import Company, BaseModel
 User = get_user_model()
 
 
+class BookingQuerySet(models.QuerySet):
+    def active(self):
+        return self.filter(is_active=True)
+
+    def overlapping(self, room, start, end):
+        # Two intervals overlap when each one starts before the other ends.
+        return self.active().filter(room=room, start__lt=end, end__gt=start)
+
+
 class Booking(BaseModel):
     resident = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name="bookings")
     room = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='room_times')
@@ -13,5 +22,80 @@ class Booking(BaseModel):
     end = models.DateTimeField(null=True, blank=True)
     is_active = models.BooleanField(default=True)
 
+    objects = BookingQuerySet.as_manager()
+
+    class Meta:
+        # History piles up in the past, so leading with ``end`` keeps the overlap
+        # scan (``end > new_start``) limited to upcoming bookings of the barber.
+        indexes = [
+            models.Index(
+                fields=['room', 'end', 'start'],
+                name='booking_active_room_end_idx',
+                condition=models.Q(is_active=True),
+            ),
+            # Serves "my bookings" pages ordered by start (the id ordering rides the resident FK index).
+            models.Index(fields=['resident', 'start'], name='booking_resident_start_idx'),
+            # Max(updated_at) of the replica lag check, read every second by every worker.
+            models.Index(fields=['updated_at'], name='booking_updated_at_idx'),
+        ]
+
     def __str__(self):
         return f'The {self.room} room was booked {self.start.strftime("%Y-%m-%d %H:%M:%S")} - {self.end.strftime("%Y-%m-%d %H:%M:%S")}'
+
+
+class BookingArchive(models.Model):
+    """Bookings that ended before the archive cutoff, moved out of ``Booking`` by ``manage.py archive_bookings``.
+
+    Rows keep their booking id and timestamps, so history reads like the live table.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    resident = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='archived_bookings')
+    room = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='archived_room_times')
+    start = models.DateTimeField(null=True, blank=True)
+    end = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    # Booking fields copied verbatim when a row is archived.
+    copied_fields = ('id', 'resident_id', 'room_id', 'start', 'end', 'is_active', 'created_at', 'updated_at')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['resident', 'start'], name='archive_resident_start_idx'),
+            models.Index(fields=['room', 'start'], name='archive_room_start_idx'),
+        ]
+
+    def __str__(self):
+        return f'The {self.room} room was booked {self.start.strftime("%Y-%m-%d %H:%M:%S")} - {self.end.strftime("%Y-%m-%d %H:%M:%S")} (archived)'
+
+
+class DailyOccupancy(models.Model):
+    """Working and booked minutes of one barber on one day, kept up to date by apps.booking.occupancy.
+
+    Booked minutes count only booked time inside working hours, so utilization is
+    ``booked_minutes / working_minutes``. The hourly lists hold the same numbers
+    per local hour (0-23) for peak-hour reports.
+    """
+    barber = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_occupancy')
+    company = models.ForeignKey(Company, on_delete=models.SET_NULL, null=True, related_name='daily_occupancy')
+    day = models.DateField()
+    working_minutes = models.PositiveIntegerField(default=0)
+    booked_minutes = models.PositiveIntegerField(default=0)
+    bookings = models.PositiveIntegerField(default=0)
+    working_hourly = models.JSONField(default=list)
+    booked_hourly = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['barber', 'day'], name='occupancy_barber_day_uniq'),
+        ]
+        indexes = [
+            # Company reports read a date range of one company.
+            models.Index(fields=['company', 'day'], name='occupancy_company_day_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.barber} on {self.day}: {self.booked_minutes}/{self.working_minutes} minutes'
@@ -0,0 +1,94 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from functools import partial
+
+from django.db import transaction
+from django.utils import timezone
+
+from apps.account.models import User
+from apps.booking.models import Booking, BookingArchive, DailyOccupancy
+from apps.booking.schedule import DaySchedule, cell_minutes, span, sweep_days
+
+UPDATE_FIELDS = ['company', 'working_minutes', 'booked_minutes', 'bookings', 'working_hourly', 'booked_hourly',
+                 'updated_at']
+
+
+def minutes(cells):
+    return cells.bit_count() * cell_minutes()
+
+
+def hours():
+    """The cells of each hour of the day, as 24 bit masks."""
+    per_hour = 60 // cell_minutes()
+    return [span(hour * per_hour, (hour + 1) * per_hour) for hour in range(24)]
+
+
+def day_occupancy(barber, day, bookings):
+    """Unsaved DailyOccupancy of ``barber`` on ``day``; ``bookings`` are the (start, end) pairs touching the day."""
+    working = DaySchedule.build(day, barber, []).free
+    booked = DaySchedule(day, 0)
+    for start, end in bookings:
+        booked.occupy(start, end)
+    booked_working = booked.busy & working
+    hour_cells = hours()
+    return DailyOccupancy(
+        barber=barber,
+        company_id=barber.company_id,
+        day=day,
+        working_minutes=minutes(working),
+        booked_minutes=minutes(booked_working),
+        bookings=len(bookings),
+        working_hourly=[minutes(working & hour) for hour in hour_cells],
+        booked_hourly=[minutes(booked_working & hour) for hour in hour_cells],
+    )
+
+
+def rebuild(barbers, days):
+    """Recompute and upsert the rows of ``barbers`` for ``days`` from live and archived bookings.
+
+    Two queries whatever the number of barbers and days; returns the number of rows written.
+    """
+    days = sorted(set(days))
+    if not barbers or not days:
+        return 0
+    window_start = timezone.make_aware(datetime.combine(days[0], time.min))
+    window_end = timezone.make_aware(datetime.combine(days[-1], time.min)) + timedelta(days=1)
+
+    bookings = defaultdict(list)
+    for model in (Booking, BookingArchive):
+        for room_id, start, end in model.objects.filter(
+            is_active=True, room__in=barbers, start__lt=window_end, end__gt=window_start
+        ).values_list('room_id', 'start', 'end'):
+            bookings[room_id].append((start, end))
+
+    rows = [
+        day_occupancy(barber, day, touching)
+        for barber in barbers
+        for day, touching in sweep_days(days, sorted(bookings[barber.pk]))
+    ]
+    DailyOccupancy.objects.bulk_create(
+        rows, batch_size=1000, update_conflicts=True, unique_fields=['barber', 'day'], update_fields=UPDATE_FIELDS,
+    )
+    return len(rows)
+
+
+def refresh(room_id, days):
+    barber = User.objects.filter(pk=room_id, role='barber').first()
+    if barber is not None:
+        rebuild([barber], days)
+
+
+def refresh_on_commit(room_id, days):
+    """Recompute the days of a barber touched by a booking change once the transaction commits."""
+    if room_id is not None and days:
+        transaction.on_commit(partial(refresh, room_id, list(days)))
+
+
+def refresh_barber_on_commit(barber):
+    """After working hours or company change: recompute the barber's rows from today on; history stays as it was."""
+    def run():
+        days = DailyOccupancy.objects.filter(barber_id=barber.pk, day__gte=timezone.localdate()) \
+            .values_list('day', flat=True)
+        refresh(barber.pk, list(days))
+
+    transaction.on_commit(run)
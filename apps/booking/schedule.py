@@ -0,0 +1,146 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def cell_minutes():
+    # Read when used rather than at import, so override_settings(SCHEDULE_CELL_MINUTES=...) applies.
+    return getattr(settings, 'SCHEDULE_CELL_MINUTES', 5)
+
+
+def cell_count():
+    return 24 * 60 // cell_minutes()
+
+
+def full():
+    """Bit set with every cell of a day busy."""
+    return (1 << cell_count()) - 1
+
+
+def span(start_cell, end_cell):
+    """Bit mask covering cells ``start_cell`` up to (not including) ``end_cell``."""
+    start_cell, end_cell = max(start_cell, 0), min(end_cell, cell_count())
+    if start_cell >= end_cell:
+        return 0
+    return ((1 << (end_cell - start_cell)) - 1) << start_cell
+
+
+def cell_floor(value):
+    return (value.hour * 60 + value.minute) // cell_minutes()
+
+
+def cell_ceil(value):
+    seconds = (value.hour * 60 + value.minute) * 60 + value.second + (1 if value.microsecond else 0)
+    return -(-seconds // (cell_minutes() * 60))
+
+
+def cell_label(cell):
+    minutes = cell * cell_minutes()
+    return f'{minutes // 60:02d}:{minutes % 60:02d}:00'
+
+
+class DaySchedule:
+    """Occupancy of one barber on one day as an integer bit set, one bit per ``cell_minutes()`` cell.
+
+    A set bit means the cell is unavailable: outside working hours, during the
+    break, or (partly) covered by a booking. Bookings are rounded outwards and
+    working hours inwards, so a free cell is always entirely free.
+    """
+
+    __slots__ = ('day', 'busy', 'day_start')
+
+    def __init__(self, day, busy=None):
+        self.day = day
+        self.busy = full() if busy is None else busy
+        self.day_start = timezone.make_aware(datetime.combine(day, time.min))
+
+    @classmethod
+    def build(cls, day, barber, bookings):
+        schedule = cls(day)
+        if barber.start is not None and barber.end is not None:
+            schedule.busy &= ~span(cell_ceil(barber.start), cell_floor(barber.end))
+            if barber.break_start is not None and barber.break_end is not None:
+                schedule.busy |= span(cell_floor(barber.break_start), cell_ceil(barber.break_end))
+        for start, end in bookings:
+            schedule.occupy(start, end)
+        return schedule
+
+    def cells(self, start, end):
+        """Cells touched by the aware datetimes ``start``-``end``, clipped to this day."""
+        # Offsets from the aware start of the day need no time zone conversion.
+        cell = timedelta(minutes=cell_minutes())
+        start_cell = (start - self.day_start) // cell
+        end_cell = -((self.day_start - end) // cell)
+        return max(start_cell, 0), min(end_cell, cell_count())
+
+    def occupy(self, start, end):
+        self.busy |= span(*self.cells(start, end))
+
+    def is_free(self, start, end):
+        return not self.busy & span(*self.cells(start, end))
+
+    def free_from(self, moment):
+        """Copy of the schedule with every cell that starts before ``moment`` marked busy."""
+        cell = timedelta(minutes=cell_minutes())
+        return DaySchedule(self.day, self.busy | span(0, -((self.day_start - moment) // cell)))
+
+    @property
+    def free(self):
+        return ~self.busy & full()
+
+    def fits(self, cells):
+        """Bit set of the cells where a free run of at least ``cells`` cells starts."""
+        starts, length = self.free, 1
+        # Doubling: after each step bit i says "the next ``length`` cells are free".
+        while length < cells and starts:
+            shift = min(length, cells - length)
+            starts &= starts >> shift
+            length += shift
+        return starts
+
+    def free_runs(self):
+        """Yield ``(start_cell, end_cell)`` for each maximal run of free cells."""
+        free = self.free
+        while free:
+            start_cell = (free & -free).bit_length() - 1
+            rest = free >> start_cell
+            length = (rest ^ (rest + 1)).bit_length() - 1
+            yield start_cell, start_cell + length
+            free &= ~span(start_cell, start_cell + length)
+
+    def datetime_at(self, cell):
+        return self.day_start + timedelta(minutes=cell * cell_minutes())
+
+    def availability(self):
+        label = self.day.strftime('%d-%m-%Y')
+        return [
+            {'start': f'{label} {cell_label(start_cell)}', 'end': f'{label} {cell_label(end_cell)}'}
+            for start_cell, end_cell in self.free_runs()
+        ]
+
+
+def sweep_days(days, bookings):
+    """Yield ``(day, bookings touching day)`` for each of the ascending ``days``.
+
+    ``bookings`` are ``(start, end)`` pairs ordered by start; they are walked
+    once, keeping only those that may still reach into the current day.
+    """
+    pending = iter(bookings)
+    upcoming = next(pending, None)
+    ongoing = []
+    for day in days:
+        day_start = timezone.make_aware(datetime.combine(day, time.min))
+        day_end = day_start + timedelta(days=1)
+        ongoing = [booking for booking in ongoing if booking[1] > day_start]
+        while upcoming is not None and upcoming[0] < day_end:
+            if upcoming[1] > day_start:
+                ongoing.append(upcoming)
+            upcoming = next(pending, None)
+        yield day, ongoing
+
+
+def sweep_schedules(barber, days, bookings):
+    """Yield ``(day, DaySchedule)`` for each of the ascending ``days``; see sweep_days."""
+    for day, ongoing in sweep_days(days, bookings):
+        yield day, DaySchedule.build(day, barber, ongoing)
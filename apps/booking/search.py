@@ -0,0 +1,48 @@
+import heapq
+from datetime import timedelta
+from itertools import count, islice, takewhile
+
+from django.utils import timezone
+
+from apps.booking.schedule import cell_minutes, sweep_schedules
+
+
+def free_windows(barber, bookings, after, until, cells=1):
+    """Yield ``(start, end)`` of the free runs of ``barber`` between ``after`` and ``until`` that fit ``cells`` cells.
+
+    ``bookings`` are ``(start, end)`` pairs of the barber ordered by start. The
+    days are generated lazily, so a caller that stops early never builds the
+    schedules of later days.
+    """
+    first_day = timezone.localtime(after).date()
+    last_day = timezone.localtime(until).date()
+    days = takewhile(lambda day: day <= last_day, (first_day + timedelta(days=offset) for offset in count()))
+    for day, schedule in sweep_schedules(barber, days, bookings):
+        schedule = schedule.free_from(after)
+        starts = schedule.fits(cells)
+        for start_cell, end_cell in schedule.free_runs():
+            start = schedule.datetime_at(start_cell)
+            if start >= until:
+                return
+            if starts >> start_cell & 1:
+                yield start, min(schedule.datetime_at(end_cell), until)
+
+
+def next_free_slots(barbers, bookings_by_barber, duration, after, until, limit):
+    """Earliest ``limit`` slots of ``duration`` across ``barbers``, one per free interval.
+
+    The per-barber interval streams are merged lazily with a heap, so the search
+    stops as soon as ``limit`` slots were found.
+    """
+    cells = -(-duration // timedelta(minutes=cell_minutes()))
+
+    def stream(barber):
+        for start, end in free_windows(barber, bookings_by_barber.get(barber.pk, ()), after, until, cells):
+            yield start, barber.pk, end, barber
+
+    candidates = (
+        (barber, start)
+        for start, _, end, barber in heapq.merge(*[stream(barber) for barber in barbers])
+        if start + duration <= end
+    )
+    return list(islice(candidates, limit))
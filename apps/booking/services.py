@@ -0,0 +1,72 @@
+from bisect import bisect_left
+
+from django.db import transaction
+
+from apps.account.models import User
+from apps.booking import cache, calendar, occupancy
+from apps.booking.broker import publish
+from apps.booking.models import Booking
+from config.db import lock_rows
+
+
+def lock_room(room_id):
+    """Serialize booking writers for one barber until the surrounding transaction ends."""
+    # A row lock on the barber where there are row locks: writers for other barbers are not blocked.
+    lock_rows(User.objects.filter(pk=room_id))
+
+
+def merge_intervals(intervals):
+    """Union of start-ordered ``(start, end)`` pairs as a sorted list of disjoint intervals."""
+    merged = []
+    for start, end in intervals:
+        if merged and start < merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def bulk_book(room, resident, intervals):
+    """Book every free interval of ``intervals`` for ``room`` in one transaction.
+
+    Returns ``(created, conflicts)``; ``conflicts`` holds the indexes of the
+    intervals that overlap an existing booking or an earlier interval of the
+    same request.
+    """
+    order = sorted(range(len(intervals)), key=lambda index: intervals[index][0])
+    window_start = min(start for start, _ in intervals)
+    window_end = max(end for _, end in intervals)
+
+    with transaction.atomic():
+        lock_room(room.pk)
+        taken = merge_intervals(
+            Booking.objects.active().filter(room=room, start__lt=window_end, end__gt=window_start)
+            .order_by('start').values_list('start', 'end')
+        )
+        taken_starts = [start for start, _ in taken]
+
+        accepted, conflicts = [], []
+        accepted_end = None
+        for index in order:
+            start, end = intervals[index]
+            # ``taken`` is disjoint, so only the last interval starting before ``end`` can overlap.
+            position = bisect_left(taken_starts, end) - 1
+            if (position >= 0 and taken[position][1] > start) or (accepted_end is not None and accepted_end > start):
+                conflicts.append(index)
+                continue
+            accepted.append(index)
+            accepted_end = end if accepted_end is None else max(accepted_end, end)
+
+        created = Booking.objects.bulk_create(
+            Booking(room=room, resident=resident, start=intervals[index][0], end=intervals[index][1])
+            for index in sorted(accepted)
+        )
+
+    # bulk_create sends no post_save signals, so invalidate the cached days and notify streams here.
+    if created:
+        days = {day for booking in created for day in cache.booking_days(booking.start, booking.end)}
+        cache.invalidate_on_commit(room.pk, days)
+        publish(room.pk, days)
+        occupancy.refresh_on_commit(room.pk, days)
+        calendar.invalidate_on_commit(room.pk)
+    return created, sorted(conflicts)
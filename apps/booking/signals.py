@@ -0,0 +1,57 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.booking import cache, calendar, occupancy
+from apps.booking.broker import publish
+from apps.booking.models import Booking
+
+User = get_user_model()
+
+
+@receiver(pre_save, sender=Booking)
+def remember_previous_span(sender, instance, raw=False, **kwargs):
+    # An update can move a booking to another barber or day; both the old and
+    # the new days need to be invalidated.
+    instance._previous_span = None
+    if instance.pk and not raw:
+        instance._previous_span = sender.objects.filter(pk=instance.pk).values_list('room_id', 'start', 'end').first()
+
+
+@receiver(post_save, sender=Booking)
+def invalidate_saved_booking(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_span', None)
+    if previous is not None:
+        room_id, start, end = previous
+        cache.invalidate_on_commit(room_id, cache.booking_days(start, end))
+        publish(room_id, cache.booking_days(start, end))
+        occupancy.refresh_on_commit(room_id, cache.booking_days(start, end))
+        calendar.invalidate_on_commit(room_id)
+    cache.invalidate_on_commit(instance.room_id, cache.booking_days(instance.start, instance.end))
+    publish(instance.room_id, cache.booking_days(instance.start, instance.end))
+    occupancy.refresh_on_commit(instance.room_id, cache.booking_days(instance.start, instance.end))
+    calendar.invalidate_on_commit(instance.room_id)
+
+
+@receiver(post_delete, sender=Booking)
+def invalidate_deleted_booking(sender, instance, **kwargs):
+    cache.invalidate_on_commit(instance.room_id, cache.booking_days(instance.start, instance.end))
+    publish(instance.room_id, cache.booking_days(instance.start, instance.end))
+    occupancy.refresh_on_commit(instance.room_id, cache.booking_days(instance.start, instance.end))
+    calendar.invalidate_on_commit(instance.room_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_barber(sender, instance, **kwargs):
+    if instance.role == 'barber':
+        cache.invalidate_room_on_commit(instance.pk)
+        calendar.invalidate_on_commit(instance.pk)
+        publish(instance.pk)
+
+
+@receiver(post_save, sender=User)
+def refresh_barber_occupancy(sender, instance, raw=False, **kwargs):
+    # Deleting a barber cascades to their occupancy rows.
+    if instance.role == 'barber' and not raw:
+        occupancy.refresh_barber_on_commit(instance)
@@ -0,0 +1,26 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+
+def post_bookings(url, jobs, timeout=30):
+    """Worker body for the stress harness. Kept free of Django imports so it runs under any start method."""
+    results = []
+    for token, payload in jobs:
+        request = urllib.request.Request(
+            url,
+            data=json.dumps(payload).encode(),
+            headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'},
+            method='POST',
+        )
+        started = time.perf_counter()
+        try:
+            with urllib.request.urlopen(request, timeout=timeout) as response:
+                status = response.status
+        except urllib.error.HTTPError as exc:
+            status = exc.code
+        except (urllib.error.URLError, OSError):
+            status = 0
+        results.append((status, (time.perf_counter() - started) * 1000))
+    return results
@@ -1,3 +1,864 @@
-from django.test import TestCase
+import asyncio
+import csv
+import json
+import shutil
+import tempfile
+import threading
+import time as clock
+from unittest import mock
+from datetime import date, datetime, time, timedelta
+from io import StringIO
+from types import SimpleNamespace
+from urllib.parse import urlsplit
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import F, QuerySet
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from apps.account.models import User, Company
+from apps.booking import cache, calendar
+from apps.booking.api.views import BookingDetailAPIView, RoomAvailabilityRetrieveView
+from apps.booking.archive import archive_bookings
+from apps.booking.broker import Broker
+from apps.booking.occupancy import rebuild
+from apps.booking.schedule import DaySchedule, cell_ceil, cell_count, cell_floor, span
+from apps.booking.models import Booking, BookingArchive, BookingQuerySet, DailyOccupancy
+from config import routers
+
+
+class DayScheduleTests(SimpleTestCase):
+    def setUp(self):
+        self.day = date(2030, 1, 7)
+        self.barber = SimpleNamespace(start=time(9, 2), end=time(18), break_start=time(13), break_end=time(13, 30))
+
+    def at(self, hour, minute=0, days=0):
+        return timezone.make_aware(datetime.combine(self.day, time(hour, minute))) + timedelta(days=days)
+
+    def cell(self, hour, minute=0):
+        return (hour * 60 + minute) // 5
+
+    def test_cell_rounding(self):
+        self.assertEqual((cell_floor(time(9)), cell_ceil(time(9))), (108, 108))
+        self.assertEqual((cell_floor(time(9, 2)), cell_ceil(time(9, 2))), (108, 109))
+        self.assertEqual(cell_ceil(time(9, 0, 0, 1)), 109)
+        self.assertEqual(cell_ceil(time(23, 59, 59)), cell_count())
+
+    def test_working_hours_and_break(self):
+        schedule = DaySchedule.build(self.day, self.barber, [])
+        # Working hours are rounded inwards, the break outwards.
+        self.assertEqual(list(schedule.free_runs()),
+                         [(self.cell(9, 5), self.cell(13)), (self.cell(13, 30), self.cell(18))])
+        self.assertEqual(schedule.availability()[0], {'start': '07-01-2030 09:05:00', 'end': '07-01-2030 13:00:00'})
+        self.assertEqual(list(DaySchedule.build(self.day, SimpleNamespace(start=None, end=None), []).free_runs()), [])
+
+    def test_cells(self):
+        schedule = DaySchedule(self.day, 0)
+        # Bookings cover every cell they touch.
+        self.assertEqual(schedule.cells(self.at(10, 3), self.at(10, 7)), (self.cell(10), self.cell(10, 10)))
+        self.assertEqual(schedule.cells(self.at(10), self.at(10, 30)), (self.cell(10), self.cell(10, 30)))
+        # Bookings reaching over midnight are clipped to the day.
+        self.assertEqual(schedule.cells(self.at(23, days=-1), self.at(1)), (0, self.cell(1)))
+        self.assertEqual(schedule.cells(self.at(23), self.at(1, days=1)), (self.cell(23), cell_count()))
+
+    def test_occupy(self):
+        schedule = DaySchedule.build(self.day, self.barber, [(self.at(10), self.at(10, 30))])
+        self.assertTrue(schedule.is_free(self.at(10, 30), self.at(11)))
+        self.assertTrue(schedule.is_free(self.at(9, 30), self.at(10)))
+        self.assertFalse(schedule.is_free(self.at(10, 25), self.at(10, 35)))
+        self.assertFalse(schedule.is_free(self.at(12, 45), self.at(13, 15)))
+        # Cells already under way are not offered any more.
+        start_cell, _ = next(schedule.free_from(self.at(9, 32)).free_runs())
+        self.assertEqual(schedule.datetime_at(start_cell), self.at(9, 35))
+
+    def test_fits(self):
+        schedule = DaySchedule(self.day)
+        schedule.busy &= ~span(self.cell(9), self.cell(10)) & ~span(self.cell(10, 30), self.cell(11))
+        self.assertEqual(schedule.fits(1), schedule.free)
+        # A run of 6 cells starts anywhere up to 6 cells before the end of a free stretch.
+        self.assertEqual(schedule.fits(6),
+                         span(self.cell(9), self.cell(9, 35)) | span(self.cell(10, 30), self.cell(10, 35)))
+        self.assertEqual(schedule.fits(12), span(self.cell(9), self.cell(9, 5)))
+        self.assertEqual(schedule.fits(13), 0)
+
+    @override_settings(SCHEDULE_CELL_MINUTES=15)
+    def test_cell_minutes_setting(self):
+        self.assertEqual(cell_count(), 96)
+        self.assertEqual((cell_floor(time(9, 10)), cell_ceil(time(9, 10))), (36, 37))
+        schedule = DaySchedule.build(self.day, self.barber, [(self.at(10, 5), self.at(10, 20))])
+        self.assertEqual(schedule.busy.bit_length(), 96)
+        self.assertEqual(list(schedule.free_runs()), [(37, 40), (42, 52), (54, 72)])
+
+
+class OverlappingTests(TestCase):
+    def setUp(self):
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.other = User.objects.create_user(username='other', role='barber', start=time(9), end=time(18))
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 10))
+        self.booking = self.book(0, 60)
+
+    def at(self, minutes):
+        return self.day + timedelta(minutes=minutes)
+
+    def book(self, start, end, room=None, **kwargs):
+        return Booking.objects.create(room=room or self.barber, start=self.at(start), end=self.at(end), **kwargs)
+
+    def overlapping(self, start, end):
+        return list(Booking.objects.overlapping(self.barber, self.at(start), self.at(end)))
+
+    def test_touching_ends(self):
+        self.assertEqual(self.overlapping(-30, 0), [])
+        self.assertEqual(self.overlapping(60, 90), [])
+        self.assertEqual(self.overlapping(-30, 1), [self.booking])
+        self.assertEqual(self.overlapping(59, 90), [self.booking])
+
+    def test_containment(self):
+        self.assertEqual(self.overlapping(15, 45), [self.booking])
+        self.assertEqual(self.overlapping(-30, 90), [self.booking])
+        self.assertEqual(self.overlapping(0, 60), [self.booking])
+
+    def test_inactive_and_other_rooms(self):
+        self.book(60, 120, is_active=False)
+        self.book(60, 120, room=self.other)
+        self.assertEqual(self.overlapping(30, 120), [self.booking])
+        self.booking.is_active = False
+        self.booking.save()
+        self.assertEqual(self.overlapping(0, 120), [])
+
+
+class QueryCountTests(APITestCase):
+    """Guard against N+1 queries: each endpoint must cost the same for 1 or many rows.
+
+    Conditional views add one query for their ETag, see config.conditional.
+    """
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.company = Company.objects.create(name='company', address='address')
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.client.force_authenticate(self.resident)
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 9))
+
+    def add_barbers(self, count):
+        barbers = []
+        for _ in range(count):
+            barber = User.objects.create_user(username=f'barber-{User.objects.count()}',
+                                              role='barber', company=self.company, start=time(9), end=time(18))
+            Booking.objects.bulk_create(
+                Booking(room=barber, resident=self.resident, start=self.day + timedelta(hours=hour),
+                        end=self.day + timedelta(hours=hour, minutes=30))
+                for hour in range(0, 8, 2)
+            )
+            barbers.append(barber)
+        return barbers
+
+    def test_booking_list(self):
+        self.add_barbers(1)
+        with self.assertNumQueries(2):
+            self.client.get('/api/v1/Bookings/')
+        self.add_barbers(5)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/Bookings/')
+        self.assertEqual(len(response.data['results']), 24)
+
+    def test_booking_detail(self):
+        self.add_barbers(1)
+        booking = Booking.objects.first()
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/Booking/{booking.pk}/')
+        self.assertEqual(response.data['room']['company'], self.company.name)
+
+    def test_room_availability(self):
+        barber, = self.add_barbers(1)
+        with self.assertNumQueries(2):
+            self.client.get(f'/api/v1/Room/{barber.pk}/Availability/Range/?from=01-01-2030&to=14-01-2030')
+        with self.assertNumQueries(0):
+            self.client.get(f'/api/v1/Room/{barber.pk}/Availability/?date=07-01-2030')
+
+    def test_company_availability(self):
+        self.add_barbers(1)
+        with self.assertNumQueries(3):
+            self.client.get(f'/api/v1/Company/{self.company.pk}/Availability/?date=07-01-2030')
+        self.add_barbers(5)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/Company/{self.company.pk}/Availability/?date=07-01-2030')
+        self.assertEqual(len(response.data['barbers']), 6)
+
+    def test_company_next_slots(self):
+        self.add_barbers(5)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/Company/{self.company.pk}/NextSlots/'
+                                       f'?duration=60&after=07-01-2030 08:00&limit=3')
+        self.assertEqual(response.data[0]['start'], '07-01-2030 09:30:00')
+
+
+class AsyncViewTests(APITestCase):
+    """The ASGI endpoints answer exactly like their synchronous counterparts."""
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18),
+                                               break_start=time(13), break_end=time(14))
+        day = timezone.make_aware(datetime(2030, 1, 7, 9))
+        Booking.objects.bulk_create(
+            Booking(room=self.barber, resident=self.resident, start=day + timedelta(hours=hour),
+                    end=day + timedelta(hours=hour, minutes=30))
+            for hour in range(0, 8, 2)
+        )
+        self.headers = {'Authorization': f'Bearer {self.resident.tokens["access"]}'}
+
+    async def get_both(self, sync_path, async_path):
+        expected = await self.async_client.get(sync_path, headers=self.headers)
+        response = await self.async_client.get(async_path, headers=self.headers)
+        self.assertEqual(response.status_code, expected.status_code)
+        return response.json(), expected.json()
+
+    async def test_room_availability(self):
+        response, expected = await self.get_both(
+            f'/api/v1/Room/{self.barber.pk}/Availability/?date=07-01-2030',
+            f'/api/v1/Async/Room/{self.barber.pk}/Availability/?date=07-01-2030',
+        )
+        self.assertEqual(response, expected)
+        response = await self.async_client.get('/api/v1/Async/Room/0/Availability/?date=07-01-2030')
+        self.assertEqual(response.status_code, 404)
+
+    async def test_booking_list(self):
+        response, expected = await self.get_both('/api/v1/Bookings/?page_size=3&ordering=start',
+                                                 '/api/v1/Async/Bookings/?page_size=3&ordering=start')
+        self.assertEqual(len(response['results']), 3)
+        self.assertEqual(response['results'], expected['results'])
+        self.assertEqual(urlsplit(response['next']).query, urlsplit(expected['next']).query)
+        response = await self.async_client.get('/api/v1/Async/Bookings/')
+        self.assertEqual(response.status_code, 401)
+
+    async def test_booking_list_etag(self):
+        expected = await self.async_client.get('/api/v1/Bookings/', headers=self.headers)
+        response = await self.async_client.get('/api/v1/Async/Bookings/', headers=self.headers)
+        self.assertEqual(response['ETag'], expected['ETag'])
+        response = await self.async_client.get('/api/v1/Async/Bookings/',
+                                               headers={**self.headers, 'If-None-Match': expected['ETag']})
+        self.assertEqual(response.status_code, 304)
+
+    async def test_archived_booking_list(self):
+        await sync_to_async(list)(archive_bookings(timezone.make_aware(datetime(2030, 1, 8))))
+        response, expected = await self.get_both('/api/v1/Bookings/?archived=1', '/api/v1/Async/Bookings/?archived=1')
+        self.assertEqual(len(response['results']), 4)
+        self.assertEqual(response, expected)
+
+    async def test_profile(self):
+        response, expected = await self.get_both('/api/v1/Profile/', '/api/v1/Async/Profile/')
+        self.assertEqual(response, expected)
+
+
+class BrokerTests(SimpleTestCase):
+    """One reload per change, fanned out to every subscriber of the day as a slot diff."""
+
+    def setUp(self):
+        self.broker = Broker()
+        self.slots = [{'start': '09:00', 'end': '18:00'}]
+        self.loads = 0
+
+    async def load(self):
+        self.loads += 1
+        return list(self.slots)
+
+    async def test_fan_out(self):
+        async with self.broker.subscribe(1, 'day', self.load) as (version, slots, first), \
+                self.broker.subscribe(1, 'day', self.load) as (_, _, second):
+            self.assertEqual((version, slots), (0, self.slots))
+            self.slots = [{'start': '09:00', 'end': '10:00'}, {'start': '11:00', 'end': '18:00'}]
+            # Two notifications before the loop runs collapse into one reload.
+            self.broker.notify(1, ['day'])
+            self.broker.notify(1, ['day'])
+            self.broker.notify(2, ['day'])
+            events = [await asyncio.wait_for(queue.get(), 1) for queue in (first, second)]
+        self.assertEqual(self.loads, 2)
+        self.assertEqual(events[0], events[1])
+        kind, version, changes = events[0]
+        self.assertEqual((kind, version), ('changes', 1))
+        self.assertEqual(changes, {'added': self.slots, 'removed': [{'start': '09:00', 'end': '18:00'}]})
+        self.assertEqual(self.broker.topics, {})
+        self.assertIsNone(self.broker.loop)
+
+    def test_stream_needs_asgi(self):
+        response = self.client.get('/api/v1/Room/1/Availability/Stream/')
+        self.assertEqual(response.status_code, 501)
+
+
+class BulkBookingTests(APITestCase):
+    def setUp(self):
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.client.force_authenticate(self.resident)
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 10))
+
+    def post(self, **data):
+        return self.client.post('/api/v1/Booking/Bulk/', {'room': self.barber.pk, **data}, format='json')
+
+    def items(self, *spans):
+        return [{'start': self.day + timedelta(minutes=start), 'end': self.day + timedelta(minutes=end)}
+                for start, end in spans]
+
+    def starts(self):
+        starts = Booking.objects.order_by('start').values_list('start', flat=True)
+        return [timezone.localtime(start) for start in starts]
+
+    def test_overlaps_within_request(self):
+        # Touching ends do not overlap; the second item overlaps the first.
+        response = self.post(items=self.items((0, 60), (30, 90), (60, 90)))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([conflict['index'] for conflict in response.data['conflicts']], [1])
+        self.assertEqual(self.starts(), [self.day, self.day + timedelta(hours=1)])
+
+    def test_overlaps_existing(self):
+        Booking.objects.create(room=self.barber, resident=self.resident, start=self.day,
+                               end=self.day + timedelta(minutes=30))
+        response = self.post(items=self.items((15, 45), (30, 60)))
+        self.assertEqual([conflict['index'] for conflict in response.data['conflicts']], [0])
+        self.assertEqual(len(response.data['created']), 1)
+
+        response = self.post(items=self.items((0, 30)))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_recurrence_count(self):
+        response = self.post(recurrence={'start': self.day, 'end': self.day + timedelta(minutes=30),
+                                         'freq': 'weekly', 'interval': 2, 'count': 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.starts(), [self.day + timedelta(weeks=weeks) for weeks in (0, 2, 4)])
+
+    def test_recurrence_until(self):
+        response = self.post(recurrence={'start': self.day, 'end': self.day + timedelta(minutes=30),
+                                         'freq': 'daily', 'until': '2030-01-09'})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.starts(), [self.day + timedelta(days=days) for days in range(3)])
+
+    def test_recurrence_bounds(self):
+        recurrence = {'start': self.day, 'end': self.day + timedelta(minutes=30), 'freq': 'weekly', 'count': 2}
+        self.assertEqual(self.post(recurrence=dict(recurrence, interval=10 ** 12)).status_code, 400)
+        late = timezone.make_aware(datetime(9999, 12, 27, 10))
+        self.assertEqual(self.post(recurrence=dict(recurrence, start=late, end=late)).status_code, 400)
+        self.assertFalse(Booking.objects.exists())
+
+
+class PaginationTests(APITestCase):
+    def setUp(self):
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.client.force_authenticate(self.resident)
+        day = timezone.make_aware(datetime(2030, 1, 7, 9))
+        # Several bookings share each start, so pages end in the middle of a tie.
+        Booking.objects.bulk_create(
+            Booking(room=self.barber, resident=self.resident, start=day + timedelta(hours=i % 3),
+                    end=day + timedelta(hours=i % 3, minutes=30))
+            for i in range(10)
+        )
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            ids += [booking['id'] for booking in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_ties_page_stably(self):
+        bookings = sorted(Booking.objects.all(), key=lambda booking: (booking.start, booking.pk))
+        for ordering, expected in (('start', bookings), ('-start', bookings[::-1])):
+            for page_size in (2, 3, 4):
+                self.assertEqual(self.walk(f'/api/v1/Bookings/?ordering={ordering}&page_size={page_size}'),
+                                 [booking.pk for booking in expected])
+
+    def test_id_breaks_ties(self):
+        # SQLite happens to return ties in id order anyway; other databases need it asked for.
+        for ordering, direction in (('start', 'ASC'), ('-start', 'DESC')):
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(f'/api/v1/Bookings/?ordering={ordering}')
+            self.assertIn(f'"booking_booking"."start" {direction}, "booking_booking"."id" {direction}',
+                          queries[-1]['sql'])
+
+
+class ArchiveTests(APITestCase):
+    def setUp(self):
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.client.force_authenticate(self.resident)
+        now = timezone.now()
+        Booking.objects.bulk_create(
+            Booking(room=self.barber, resident=self.resident, start=now + timedelta(days=offset),
+                    end=now + timedelta(days=offset, minutes=30))
+            for offset in (-90, -60, -45, -1, 3)
+        )
+
+    def test_archive_in_batches(self):
+        cutoff = timezone.now() - timedelta(days=30)
+        self.assertEqual(list(archive_bookings(cutoff, batch_size=2)), [2, 3])
+        self.assertEqual(Booking.objects.count(), 2)
+        self.assertFalse(Booking.objects.filter(end__lt=cutoff).exists())
+        self.assertEqual(BookingArchive.objects.filter(end__lt=cutoff).count(), 3)
+        self.assertEqual(list(archive_bookings(cutoff)), [])
+
+    def test_raw_delete(self):
+        # archive_batch deletes through the private QuerySet._raw_delete: a Django upgrade that
+        # drops it or changes what it runs must fail here.
+        self.assertTrue(callable(getattr(QuerySet, '_raw_delete', None)))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(list(archive_bookings(timezone.now() - timedelta(days=30), batch_size=2)), [2, 3])
+        deletes = [query['sql'] for query in queries if query['sql'].startswith('DELETE')]
+        self.assertEqual(len(deletes), 2)
+        self.assertTrue(all(sql.startswith('DELETE FROM "booking_booking" WHERE') for sql in deletes))
+
+    def test_side_effects(self):
+        # Archiving skips Booking's post_delete handlers; see archive_batch for why that is safe.
+        days = sorted({timezone.localtime(start).date() for start in Booking.objects.values_list('start', flat=True)})
+        rebuild([self.barber], days)
+        occupancy = list(DailyOccupancy.objects.order_by('day').values_list('day', 'booked_minutes', 'bookings'))
+        cache.get_cache().clear()
+        cache.get_many_or_compute(self.barber.pk, days, lambda missing: {day: 0 for day in missing})
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            list(archive_bookings(timezone.now() - timedelta(days=30)))
+        self.assertEqual(len(cache.lookup(self.barber.pk, days)[1]), len(days))
+        for callback in callbacks:
+            callback()
+        # Only the archived days are dropped from the availability cache.
+        self.assertEqual(sorted(cache.lookup(self.barber.pk, days)[1]), days[3:])
+
+        self.assertEqual(list(DailyOccupancy.objects.order_by('day').values_list('day', 'booked_minutes', 'bookings')),
+                         occupancy)
+        rebuild([self.barber], days)
+        self.assertEqual(list(DailyOccupancy.objects.order_by('day').values_list('day', 'booked_minutes', 'bookings')),
+                         occupancy)
+
+    def test_booking_list_reads_archive(self):
+        archived_ids = set(Booking.objects.filter(end__lt=timezone.now() - timedelta(days=30))
+                           .values_list('id', flat=True))
+        list(archive_bookings())
+        response = self.client.get('/api/v1/Bookings/')
+        self.assertEqual(len(response.data['results']), 2)
+        response = self.client.get('/api/v1/Bookings/?archived=1')
+        self.assertEqual({booking['id'] for booking in response.data['results']}, archived_ids)
+
+
+class OccupancyTests(APITestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='company', address='address')
+        self.barber = User.objects.create_user(username='barber', role='barber', company=self.company,
+                                               start=time(9), end=time(18), break_start=time(13), break_end=time(14))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 9))
+
+    def book(self, start, minutes):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Booking.objects.create(room=self.barber, resident=self.resident, start=start,
+                                          end=start + timedelta(minutes=minutes))
+
+    def test_maintained_on_booking_changes(self):
+        self.book(self.day, 90)
+        # Only the half hour before the break counts as booked working time.
+        booking = self.book(self.day.replace(hour=12, minute=30), 90)
+        row = DailyOccupancy.objects.get(barber=self.barber, day=self.day.date())
+        self.assertEqual((row.working_minutes, row.booked_minutes, row.bookings), (480, 120, 2))
+        self.assertEqual(row.booked_hourly[9:14], [60, 30, 0, 30, 0])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        row.refresh_from_db()
+        self.assertEqual((row.booked_minutes, row.bookings), (90, 1))
+
+        incremental = list(DailyOccupancy.objects.values_list('booked_minutes', 'booked_hourly'))
+        DailyOccupancy.objects.all().delete()
+        rebuild([self.barber], [self.day.date()])
+        self.assertEqual(list(DailyOccupancy.objects.values_list('booked_minutes', 'booked_hourly')), incremental)
+
+    def test_reports(self):
+        rebuild([self.barber], [datetime(2030, 1, day).date() for day in range(1, 32)])
+        self.book(self.day, 240)
+        admin = User.objects.create_superuser(username='admin', password='admin', role='admin')
+        self.client.force_authenticate(admin)
+
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/v1/Company/{self.company.pk}/Utilization/'
+                                       f'?from=01-01-2030&to=31-01-2030&period=month')
+        self.assertEqual(response.data['total']['working_minutes'], 31 * 480)
+        self.assertEqual(response.data['periods'][0]['booked_minutes'], 240)
+        self.assertEqual(response.data['barbers'][0]['id'], self.barber.pk)
+
+        response = self.client.get(f'/api/v1/Company/{self.company.pk}/PeakHours/?from=01-01-2030&to=31-01-2030')
+        self.assertEqual(response.data['peak'][0], '09:00')
+        self.assertEqual(len(response.data['hours']), 8)
+
+
+class AvailabilityRangeTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18),
+                                               break_start=time(13), break_end=time(14))
+        self.client.force_authenticate(self.resident)
+        self.url = f'/api/v1/Room/{self.barber.pk}/Availability/Range/'
+
+    def test_slots_per_day(self):
+        # Runs from the evening of the 7th into the morning of the 8th, so it takes time off both days.
+        Booking.objects.create(room=self.barber, resident=self.resident,
+                               start=timezone.make_aware(datetime(2030, 1, 7, 17)),
+                               end=timezone.make_aware(datetime(2030, 1, 8, 10)))
+        response = self.client.get(self.url, {'from': '07-01-2030', 'to': '09-01-2030'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({entry['date']: [(slot['start'][-8:], slot['end'][-8:]) for slot in entry['slots']]
+                          for entry in response.data}, {
+            '07-01-2030': [('09:00:00', '13:00:00'), ('14:00:00', '17:00:00')],
+            '08-01-2030': [('10:00:00', '13:00:00'), ('14:00:00', '18:00:00')],
+            '09-01-2030': [('09:00:00', '13:00:00'), ('14:00:00', '18:00:00')],
+        })
+
+    def test_invalid_ranges(self):
+        for query in ({'from': '31-12-9999', 'to': '31-12-9999'}, {'from': '01-01-0001'},
+                      {'from': '09-01-2030', 'to': '07-01-2030'}, {'from': '01-01-2030', 'to': '01-04-2030'},
+                      {'from': '2030-01-07'}):
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(self.url, query).status_code, 400)
+
+
+class AvailabilityInvalidationTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.start = timezone.make_aware(datetime(2030, 1, 7, 10))
+        self.days = [self.start.date(), self.start.date() + timedelta(days=1)]
+
+    def cached_days(self):
+        _, values = cache.lookup(self.barber.pk, self.days)
+        return sorted(values)
+
+    def fill(self):
+        cache.get_many_or_compute(self.barber.pk, self.days, lambda days: {day: 'free' for day in days})
+        self.assertEqual(self.cached_days(), self.days)
+
+    def test_create(self):
+        self.fill()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Booking.objects.create(room=self.barber, resident=self.resident, start=self.start,
+                                   end=self.start + timedelta(minutes=30))
+            # Readers before the commit still see the old rows; whatever they cache is dropped after it.
+            self.assertEqual(self.cached_days(), self.days)
+        for callback in callbacks:
+            callback()
+        self.assertEqual(self.cached_days(), self.days[1:])
+
+    def test_move(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(room=self.barber, resident=self.resident, start=self.start,
+                                             end=self.start + timedelta(minutes=30))
+        self.fill()
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.start += timedelta(days=1)
+            booking.end += timedelta(days=1)
+            booking.save()
+        self.assertEqual(self.cached_days(), [])
+
+    def test_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            booking = Booking.objects.create(room=self.barber, resident=self.resident, start=self.start,
+                                             end=self.start + timedelta(minutes=30))
+        self.fill()
+        with self.captureOnCommitCallbacks(execute=True):
+            booking.delete()
+        self.assertEqual(self.cached_days(), self.days[1:])
+
+
+class ReplicaRoutingTests(APITransactionTestCase):
+    def setUp(self):
+        # The test database is the primary; the replica is a second SQLite file, as
+        # DATABASE_REPLICAS would configure it.
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings.DATABASES['replica_0'] = dict(
+            connections['default'].settings_dict, NAME=f'file:{directory}/replica.sqlite3?mode=ro',
+            OPTIONS={'uri': True}, TEST={'MIRROR': 'default'},
+        )
+        self.addCleanup(self.drop_replica)
+        routers._replica_health.clear()
+        routers.pin_cache().clear()
+        cache.get_cache().clear()
+
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 10))
+        self.book(self.day)
+        self.sync()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.resident).access_token}')
+
+    def drop_replica(self):
+        connections['replica_0'].close()
+        del connections['replica_0']
+        del settings.DATABASES['replica_0']
+
+    def sync(self):
+        call_command('sync_replicas', stdout=StringIO())
+        routers._replica_health.clear()
+
+    def book(self, start):
+        return Booking.objects.create(room=self.barber, resident=self.resident, start=start,
+                                      end=start + timedelta(minutes=30))
+
+    def listed(self):
+        return len(self.client.get('/api/v1/Bookings/').data['results'])
+
+    def test_lag(self):
+        self.book(self.day + timedelta(hours=1))
+        self.assertTrue(routers.replica_is_current('replica_0'))
+        self.assertEqual(self.listed(), 1)
+
+        Booking.objects.update(updated_at=F('updated_at') + timedelta(seconds=10))
+        self.assertTrue(routers.replica_is_current('replica_0'))
+        routers._replica_health.clear()
+        self.assertFalse(routers.replica_is_current('replica_0'))
+        self.assertEqual(self.listed(), 2)
+
+    def test_pin(self):
+        response = self.client.post('/api/v1/Booking/', {
+            'room': self.barber.pk, 'start': self.day + timedelta(hours=1), 'end': self.day + timedelta(hours=2),
+        })
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(self.listed(), 2)
+
+        # Other clients are not pinned and still read the replica.
+        other = User.objects.create_user(username='other', password='other')
+        Booking.objects.create(room=self.barber, resident=other, start=self.day, end=self.day)
+        self.sync()
+        self.book(self.day + timedelta(hours=3))
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        self.assertEqual(self.listed(), 1)
+
+    def test_cache_fill_reads_primary(self):
+        booking = self.book(self.day + timedelta(hours=1))
+        self.client.get(f'/api/v1/Room/{self.barber.pk}/Availability/', {'date': '07-01-2030'})
+        _, values = cache.lookup(self.barber.pk, [self.day.date()])
+        # Both bookings are cached, though the replica only has the first.
+        primary = dict(RoomAvailabilityRetrieveView.build_schedules(self.barber.pk, [self.day.date()]))
+        self.assertEqual(values[self.day.date()], primary[self.day.date()].busy)
+        self.assertEqual(Booking.objects.using('replica_0').filter(pk=booking.pk).count(), 0)
+
+
+class ExportTests(APITestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='company', address='address')
+        self.barber = User.objects.create_user(username='barber', role='barber', company=self.company,
+                                               start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.admin = User.objects.create_superuser(username='admin', password='admin', role='admin')
+        self.client.force_authenticate(self.admin)
+        day = timezone.make_aware(datetime(2030, 1, 7, 9))
+        self.bookings = Booking.objects.bulk_create(
+            Booking(room=self.barber, resident=self.resident, start=day + timedelta(hours=hours),
+                    end=day + timedelta(hours=hours, minutes=30))
+            for hours in (0, 1, 2, 24 * 30)
+        )
+        # The first booking moves to the archive; exports still include it, in start order.
+        list(archive_bookings(day + timedelta(hours=1)))
+
+    def test_endpoint(self):
+        url = f'/api/v1/Company/{self.company.pk}/Export/?from=07-01-2030&to=07-01-2030'
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment', response['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([int(row['id']) for row in rows], [booking.pk for booking in self.bookings[:3]])
+        self.assertEqual([row['archived'] for row in rows], ['True', 'False', 'False'])
+        self.assertEqual(rows[0]['barber'], 'barber')
+
+        response = self.client.get(url + '&type=ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['start'], '2030-01-07T09:00:00+05:00')
+
+        self.assertEqual(self.client.get(url + '&type=xml').status_code, 400)
+        self.client.force_authenticate(self.resident)
+        self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_command(self):
+        out = StringIO()
+        call_command('export_bookings', self.company.pk, '--from=01-01-2030', '--to=28-02-2030',
+                     '--format=ndjson', stdout=out)
+        self.assertEqual([json.loads(line)['id'] for line in out.getvalue().splitlines()],
+                         [booking.pk for booking in self.bookings])
+
+
+class CalendarFeedTests(APITestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident', first_name='Ali; Vali')
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.booking = Booking.objects.create(room=self.barber, resident=self.resident, start=start,
+                                              end=start + timedelta(minutes=30))
+        self.client.force_authenticate(self.barber)
+        self.url = urlsplit(self.client.get(f'/api/v1/Room/{self.barber.pk}/Calendar/').data['url'])
+        self.client.force_authenticate(None)
+
+    def get(self, **headers):
+        return self.client.get(self.url.path, {'token': dict([self.url.query.split('=')])['token']}, **headers)
+
+    def test_feed(self):
+        response = self.get()
+        body = response.content.decode()
+        self.assertEqual(response['Content-Type'], 'text/calendar; charset=utf-8')
+        self.assertIn(f'UID:booking-{self.booking.pk}@testserver\r\n', body)
+        self.assertIn('SUMMARY:Ali\\; Vali\r\n', body)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(self.get(HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+        # A delete leaves Max(updated_at) as it was; the booking count still changes the ETag.
+        Booking.objects.create(room=self.barber, resident=self.resident, start=self.booking.start,
+                               end=self.booking.end, is_active=False).delete()
+        cache.get_cache().clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.booking.is_active = False
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.booking.save()
+        # The entry is only dropped once the change is committed.
+        self.assertEqual(self.get(HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        for callback in callbacks:
+            callback()
+        changed = self.get(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertIn('STATUS:CANCELLED', changed.content.decode())
+
+    def test_token(self):
+        self.assertEqual(self.client.get(self.url.path, {'token': 'forged'}).status_code, 404)
+        other = User.objects.create_user(username='other', role='barber')
+        self.client.force_authenticate(other)
+        self.assertEqual(self.client.get(f'/api/v1/Room/{self.barber.pk}/Calendar/').status_code, 403)
+        self.assertFalse(calendar.check_token(other.pk, calendar.token(self.barber.pk)))
+
+
+class ConditionalRequestTests(APITestCase):
+    def setUp(self):
+        self.company = Company.objects.create(name='company', address='address')
+        self.barber = User.objects.create_user(username='barber', role='barber', company=self.company,
+                                               start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.client.force_authenticate(self.resident)
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 10))
+        self.booking = Booking.objects.create(room=self.barber, resident=self.resident, start=self.day,
+                                              end=self.day + timedelta(minutes=30))
+        self.url = f'/api/v1/Booking/{self.booking.pk}/'
+
+    def test_detail(self):
+        response = self.client.get(self.url)
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code,
+                         304)
+
+        # The nested company is part of the representation.
+        self.company.name = 'renamed'
+        self.company.save()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_if_match(self):
+        etag = self.client.get(self.url)['ETag']
+        data = {'room': self.barber.pk, 'start': self.day + timedelta(hours=1),
+                'end': self.day + timedelta(hours=1, minutes=30)}
+        response = self.client.patch(self.url, data, HTTP_IF_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        # A second writer still holding the old ETag must not overwrite the change.
+        self.assertEqual(self.client.patch(self.url, data, HTTP_IF_MATCH=etag).status_code, 412)
+        self.assertEqual(self.client.get(self.url)['ETag'], response['ETag'])
+
+    def test_list(self):
+        other = Booking.objects.create(room=self.barber, resident=self.resident, start=self.day + timedelta(hours=2),
+                                       end=self.day + timedelta(hours=2, minutes=30))
+        response = self.client.get('/api/v1/Bookings/')
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertEqual(self.client.get('/api/v1/Bookings/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        Booking.objects.filter(pk=other.pk).delete()
+        self.assertEqual(self.client.get('/api/v1/Bookings/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        # Another resident with the same bookings count still gets their own ETag.
+        self.client.force_authenticate(self.barber)
+        self.assertEqual(self.client.get('/api/v1/Bookings/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+
+
+class ConcurrentWriteTests(APITransactionTestCase):
+    """Writers racing on separate connections, as workers do."""
+
+    def setUp(self):
+        self.barber = User.objects.create_user(username='barber', role='barber', start=time(9), end=time(18))
+        self.resident = User.objects.create_user(username='resident', password='resident')
+        self.day = timezone.make_aware(datetime(2030, 1, 7, 10))
+
+    def race(self, request, arguments):
+        """Run ``request(client, argument)`` for each argument at once; returns the status codes."""
+        barrier = threading.Barrier(len(arguments))
+        statuses = []
+
+        def run(argument):
+            client = APIClient()
+            client.force_authenticate(self.resident)
+            try:
+                barrier.wait()
+                statuses.append(request(client, argument).status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=run, args=(argument,)) for argument in arguments]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sorted(statuses)
+
+    def test_if_match(self):
+        booking = Booking.objects.create(room=self.barber, resident=self.resident, start=self.day,
+                                         end=self.day + timedelta(minutes=30))
+        url = f'/api/v1/Booking/{booking.pk}/'
+        self.client.force_authenticate(self.resident)
+        etag = self.client.get(url)['ETag']
+
+        def patch(client, hours):
+            start = self.day + timedelta(hours=hours)
+            return client.patch(url, {'start': start, 'end': start + timedelta(minutes=30)}, HTTP_IF_MATCH=etag)
+
+        perform_update = BookingDetailAPIView.perform_update
+
+        def slow_update(view, serializer):
+            # Leave the other writer time to pass an unlocked precondition check.
+            clock.sleep(0.2)
+            return perform_update(view, serializer)
+
+        # Both writers hold the same ETag; the second to get the lock sees the first one's change.
+        with mock.patch.object(BookingDetailAPIView, 'perform_update', slow_update):
+            self.assertEqual(self.race(patch, [1, 2]), [200, 412])
+
+    def test_same_slot(self):
+        def post(client, _):
+            return client.post('/api/v1/Booking/', {
+                'room': self.barber.pk, 'start': self.day, 'end': self.day + timedelta(minutes=30),
+            })
+
+        create = BookingQuerySet.create
+
+        def slow_create(queryset, **kwargs):
+            # Leave the other writer time to run its own overlap check before this one books.
+            clock.sleep(0.2)
+            return create(queryset, **kwargs)
+
+        # lock_room serializes the check and the insert, so only one of them gets the slot.
+        with mock.patch.object(BookingQuerySet, 'create', slow_create):
+            self.assertEqual(self.race(post, [1, 2]), [201, 400])
+        self.assertEqual(Booking.objects.count(), 1)
@@ -0,0 +1,11 @@
+"""
+Admin URLconf, loaded lazily by config.urls.
+
+SimpleAdminConfig skips admin autodiscovery at startup, so the apps' admin modules
+are imported here, the first time the admin is used.
+"""
+from django.contrib import admin
+
+admin.autodiscover()
+
+urlpatterns = admin.site.get_urls()
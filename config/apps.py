@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class ConfigConfig(AppConfig):
+    """Project-wide wiring that belongs to no app in particular."""
+    name = 'config'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from config.db import apply_sqlite_pragmas
+
+        connection_created.connect(apply_sqlite_pragmas, dispatch_uid='apply_sqlite_pragmas')
@@ -0,0 +1,43 @@
+from django.contrib.auth.models import AnonymousUser
+from django.http import Http404, HttpResponse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.renderers import JSONRenderer
+
+from apps.account.authentication import CachedJWTAuthentication
+
+
+class AsyncAPIView(View):
+    """Read-only async counterpart of DRF's APIView for endpoints served under ASGI.
+
+    DRF views are synchronous, so under an ASGI server each one occupies a thread
+    for the whole request. Subclasses implement ``async def get`` with the async
+    ORM instead. Authentication is JWT only (no session or basic auth); responses
+    and errors are rendered like DRF's.
+    """
+    http_method_names = ['get', 'head', 'options']
+    authentication_class = CachedJWTAuthentication
+    login_required = False
+    renderer = JSONRenderer()
+
+    async def dispatch(self, request, *args, **kwargs):
+        authenticator = self.authentication_class()
+        try:
+            result = await authenticator.aauthenticate(request)
+            # Replace AuthenticationMiddleware's lazy user: resolving it would query synchronously.
+            request.user, request.auth = result if result is not None else (AnonymousUser(), None)
+            if self.login_required and not request.user.is_authenticated:
+                raise NotAuthenticated()
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            response = self.render(data, exc.status_code)
+            if exc.status_code == status.HTTP_401_UNAUTHORIZED:
+                response['WWW-Authenticate'] = authenticator.authenticate_header(request)
+            return response
+        except Http404:
+            return self.render({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), status=status_code, content_type='application/json')
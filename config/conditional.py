@@ -0,0 +1,131 @@
+import hashlib
+from contextlib import ExitStack
+
+from django.db import transaction
+from django.db.models import Count, Max
+from django.http import HttpResponseNotModified
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import mixins, status
+from rest_framework.exceptions import APIException
+
+from config.db import lock_rows
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The resource has changed since it was read.'
+    default_code = 'precondition_failed'
+
+
+class NotModified(Exception):
+    pass
+
+
+def aggregates(fields):
+    """Max() and a distinct count per ``last_modified_fields`` entry, for one aggregate query."""
+    result = {}
+    for index, field in enumerate(fields):
+        result[f'modified_{index}'] = Max(field)
+        result[f'count_{index}'] = Count(field.rpartition('__')[0] or 'pk', distinct=True)
+    return result
+
+
+def make_etag(summary, user_id, media_type):
+    # The representation also depends on who asks and in which format.
+    key = [user_id, media_type] + [summary[name] for name in sorted(summary)]
+    return '"%s"' % hashlib.md5(repr(key).encode()).hexdigest()
+
+
+class ConditionalMixin:
+    """ETag / Last-Modified for generic views, from one aggregate query instead of the serialized body.
+
+    GET answers If-None-Match / If-Modified-Since with 304 before any serializer runs; PUT,
+    PATCH and DELETE sent with If-Match / If-Unmodified-Since get 412 when the resource changed
+    since the client read it. Those run in one transaction that locks the row before the check,
+    so of two writers holding the same ETag the second sees the first one's change. Lists are
+    validated by Max(updated_at) and a count, so deletes show too; they carry no Last-Modified,
+    which could not tell a delete apart.
+    """
+    # Timestamps whose maximum dates the response; add related ones (e.g. 'company__updated_at')
+    # for what the serializer nests, counting each relation as well.
+    last_modified_fields = ('updated_at',)
+    unsafe_methods = ('PUT', 'PATCH', 'DELETE')
+
+    def is_detail(self):
+        return isinstance(self, mixins.RetrieveModelMixin)
+
+    def is_conditional_write(self, request):
+        return request.method in self.unsafe_methods and bool(
+            {'HTTP_IF_MATCH', 'HTTP_IF_UNMODIFIED_SINCE'} & request.META.keys())
+
+    def lock_object(self):
+        """Open the write's transaction and lock the rows being written."""
+        queryset = self.get_validator_queryset()
+        # Read before the transaction starts: SQLite fails a transaction that reads and then writes
+        # while another writer holds the lock, rather than letting it wait.
+        pks = list(queryset.values_list('pk', flat=True))
+        self.write_transaction.enter_context(transaction.atomic())
+        lock_rows(queryset.model._default_manager.filter(pk__in=pks))
+
+    def get_validator_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.is_detail():
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        return queryset
+
+    def get_validators(self):
+        """``(etag, last_modified)``, both None for a detail that does not exist."""
+        summary = self.get_validator_queryset().aggregate(**aggregates(self.last_modified_fields))
+        if self.is_detail() and not summary['count_0']:
+            return None, None
+
+        etag = make_etag(summary, self.request.user.pk, self.request.accepted_media_type)
+        last_modified = None
+        if self.is_detail():
+            last_modified = max(value for name, value in summary.items() if name.startswith('modified_') and value)
+        return etag, last_modified
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.etag = self.last_modified = None
+        if self.is_conditional_write(request):
+            self.lock_object()
+        elif request.method not in ('GET', 'HEAD'):
+            return
+
+        self.etag, self.last_modified = self.get_validators()
+        if self.etag is None:
+            return
+        response = get_conditional_response(
+            request._request, etag=self.etag,
+            last_modified=self.last_modified and int(self.last_modified.timestamp()),
+        )
+        if response is not None:
+            raise NotModified() if response.status_code == status.HTTP_304_NOT_MODIFIED else PreconditionFailed()
+
+    def dispatch(self, request, *args, **kwargs):
+        # A conditional write keeps the transaction lock_object() opens until the response is done.
+        with ExitStack() as self.write_transaction:
+            return super().dispatch(request, *args, **kwargs)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            return HttpResponseNotModified()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method in ('PUT', 'PATCH') and response.status_code == status.HTTP_200_OK:
+            # Hand out the validators of the updated resource, ready for the next If-Match.
+            self.etag, self.last_modified = self.get_validators()
+        elif response.status_code not in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            return response
+        if getattr(self, 'etag', None):
+            response['ETag'] = self.etag
+            if self.last_modified:
+                response['Last-Modified'] = http_date(self.last_modified.timestamp())
+            # Responses are per user and must be revalidated, never reused as they are.
+            response['Cache-Control'] = 'private, no-cache'
+        return response
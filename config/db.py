@@ -0,0 +1,28 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.models import F
+
+
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    """connection_created receiver: run settings.SQLITE_PRAGMAS on every new SQLite connection."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            # The journal mode is stored in the database file, so only the primary sets it;
+            # read-only replicas could not anyway.
+            if name == 'journal_mode' and connection.alias != DEFAULT_DB_ALIAS:
+                continue
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+def lock_rows(queryset):
+    """Lock the rows of ``queryset`` for writing until the surrounding transaction ends."""
+    if connections[router.db_for_write(queryset.model)].features.has_select_for_update:
+        list(queryset.select_for_update().values_list('pk', flat=True))
+    else:
+        # SQLite has no row locks. A no-op write takes the database write lock
+        # up front, so a concurrent writer waits on the busy timeout instead of
+        # failing when it tries to upgrade its read lock after its checks.
+        queryset.update(**{queryset.model._meta.pk.name: F('pk')})
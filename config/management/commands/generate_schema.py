@@ -0,0 +1,31 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import schema
+
+
+class Command(BaseCommand):
+    help = ('Write the OpenAPI schema to OPENAPI_SCHEMA_FILE so workers serve it without generating it. '
+            'Run it on every deploy; --check fails when the file is out of date.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='File to write (default: OPENAPI_SCHEMA_FILE, else openapi.json).')
+        parser.add_argument('--check', action='store_true', help='Only compare the file with a fresh schema.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or settings.OPENAPI_SCHEMA_FILE or str(settings.BASE_DIR / 'openapi.json')
+        body = schema.generate()
+        if options['check']:
+            current = b''
+            if os.path.exists(path):
+                with open(path, 'rb') as artifact:
+                    current = artifact.read()
+            if current != body:
+                raise CommandError(f'{path} is out of date; run manage.py generate_schema.')
+            self.stdout.write(f'{path} is up to date (version {schema.version(body)}).')
+            return
+        with open(path, 'wb') as artifact:
+            artifact.write(body)
+        self.stdout.write(f'Wrote {path} (version {schema.version(body)}).')
@@ -0,0 +1,42 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from config import startup
+
+
+class Command(BaseCommand):
+    help = ('Boot config.wsgi (or config.asgi) in a fresh interpreter under -X importtime and report where '
+            'the time goes: per-app import / models / ready, the slowest imports and the URLconf.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--module', default='config.wsgi', choices=['config.wsgi', 'config.asgi'])
+        parser.add_argument('--runs', type=int, default=3, help='Boots to measure; the fastest is reported.')
+        parser.add_argument('--limit', type=int, default=15, help='Imports and packages listed.')
+        parser.add_argument('--depth', type=int, default=3, help='Deepest import nesting listed.')
+        parser.add_argument('--budget-ms', type=float, default=settings.STARTUP_BUDGET_MS,
+                            help='Fail when the boot takes longer (default: STARTUP_BUDGET_MS).')
+
+    def handle(self, *args, **options):
+        result = min((startup.profile(options['module']) for _ in range(options['runs'])),
+                     key=lambda result: result['boot_ms'])
+        self.stdout.write(f"{options['module']} booted in {result['boot_ms']:.0f} ms; "
+                          f"the URLconf adds {result['urls_ms']:.0f} ms on the first request.\n")
+
+        self.stdout.write(f"{'app':<28}{'import':>9}{'models':>9}{'ready':>9}")
+        for label, phases in sorted(result['apps'].items(), key=lambda item: -sum(item[1].values())):
+            self.stdout.write(f"{label:<28}" + ''.join(f"{phases.get(phase, 0):>9.1f}"
+                                                       for phase in ('import', 'models', 'ready')))
+
+        imports = [row for row in result['boot_imports'] if row[3] <= options['depth']]
+        self.stdout.write(f"\nSlowest imports at boot (cumulative ms, nesting <= {options['depth']}):")
+        for name, _, cumulative, depth in sorted(imports, key=lambda row: -row[2])[:options['limit']]:
+            self.stdout.write(f"{cumulative / 1000:>9.1f}  {'  ' * depth}{name}")
+
+        for title, rows in (('Packages at boot', result['boot_imports']),
+                            ('Packages the URLconf adds', result['url_imports'])):
+            self.stdout.write(f'\n{title} (own import time, ms):')
+            for package, milliseconds in startup.packages(rows).most_common(options['limit']):
+                self.stdout.write(f'{milliseconds:>9.1f}  {package}')
+
+        if result['boot_ms'] > options['budget_ms']:
+            raise CommandError(f"Boot took {result['boot_ms']:.0f} ms, over the {options['budget_ms']:.0f} ms budget.")
@@ -0,0 +1,37 @@
+import sqlite3
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+
+from config.routers import replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Copy the SQLite primary into the replica files listed in DATABASE_REPLICAS (local replica setup).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('aliases', nargs='*', help='Replica aliases to refresh (default: all).')
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or replica_aliases()
+        if not aliases:
+            raise CommandError('No replicas configured; set DATABASE_REPLICAS.')
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replicas only handles SQLite; use the database replication otherwise.')
+        primary.ensure_connection()
+        for alias in aliases:
+            if alias not in replica_aliases():
+                raise CommandError(f'Unknown replica {alias!r}.')
+            # Replicas are opened read-only through a file: URI; write through the plain path.
+            path = urlsplit(connections[alias].settings_dict['NAME']).path
+            connections[alias].close()
+            target = sqlite3.connect(path)
+            try:
+                primary.connection.backup(target)
+                # The copy inherits the primary's WAL mode; read-only connections need a rollback journal.
+                target.execute('PRAGMA journal_mode = DELETE')
+            finally:
+                target.close()
+            self.stdout.write(f'{alias}: copied to {path}')
@@ -0,0 +1,168 @@
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from rest_framework import serializers
+
+logger = logging.getLogger('config.instrumentation')
+
+_metrics = ContextVar('request_metrics', default=None)
+
+
+class RequestMetrics:
+    __slots__ = ('queries', 'db_time', 'serializer_time', 'serializing')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = _metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    """Put ``record_query`` on ``connection`` for good; it costs one ContextVar lookup outside sampled requests.
+
+    Connections are per thread, and under ASGI the ORM runs in sync_to_async
+    threads the middleware never sees, so every connection gets the recorder
+    when it opens (connection_created) or when a WSGI request first uses it.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def instrument_serializers():
+    """Time ``serializer.data`` of the outermost serializer of each sampled request.
+
+    Serializer.data and ListSerializer.data both end up in BaseSerializer.data,
+    so wrapping that one property covers every serializer exactly once.
+    """
+    original = serializers.BaseSerializer.data
+    if getattr(original.fget, 'instrumented', False):
+        return
+
+    def data(self):
+        metrics = _metrics.get()
+        if metrics is None or metrics.serializing:
+            return original.fget(self)
+        metrics.serializing = True
+        started = time.perf_counter()
+        try:
+            return original.fget(self)
+        finally:
+            metrics.serializing = False
+            metrics.serializer_time += time.perf_counter() - started
+
+    data.instrumented = True
+    serializers.BaseSerializer.data = property(data)
+
+
+class InstrumentationMiddleware:
+    """Report per-request wall, SQL and serializer time as JSON log lines and, opted in, ``Server-Timing`` headers.
+
+    Only a ``SAMPLE_RATE`` fraction of requests pays for query and serializer
+    accounting and is logged at DEBUG; the rest are timed as a whole. Requests
+    slower than ``SLOW_REQUEST_MS`` are logged at WARNING either way. Works in
+    both WSGI and ASGI handler chains.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        options = getattr(settings, 'INSTRUMENTATION', {})
+        self.sample_rate = options.get('SAMPLE_RATE', 0.01)
+        self.slow_request_ms = options.get('SLOW_REQUEST_MS', 1000)
+        self.server_timing = options.get('SERVER_TIMING', False)
+        instrument_serializers()
+        connection_created.connect(install_query_recorder, dispatch_uid='install_query_recorder')
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        started = time.perf_counter()
+        if not self.sampled():
+            return self.finish(request, self.get_response(request), started, None)
+
+        for connection in connections.all():
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, started, metrics)
+
+    async def __acall__(self, request):
+        started = time.perf_counter()
+        if not self.sampled():
+            return self.finish(request, await self.get_response(request), started, None)
+
+        metrics = RequestMetrics()
+        token = _metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _metrics.reset(token)
+        return self.finish(request, response, started, metrics)
+
+    def sampled(self):
+        return self.sample_rate >= 1 or random.random() < self.sample_rate
+
+    def finish(self, request, response, started, metrics):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if metrics is None:
+            if elapsed_ms >= self.slow_request_ms:
+                self.log(request, response, elapsed_ms, None)
+            return response
+
+        if self.server_timing:
+            response['Server-Timing'] = ', '.join([
+                f'app;dur={elapsed_ms:.1f}',
+                f'db;dur={metrics.db_time * 1000:.1f};desc="{metrics.queries} queries"',
+                f'serializer;dur={metrics.serializer_time * 1000:.1f}',
+            ])
+        self.log(request, response, elapsed_ms, metrics)
+        return response
+
+    def log(self, request, response, elapsed_ms, metrics):
+        match = request.resolver_match
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'route': match.route if match else None,
+            'status': response.status_code,
+            'duration_ms': round(elapsed_ms, 2),
+            'sampled': metrics is not None,
+        }
+        if metrics is not None:
+            record.update({
+                'queries': metrics.queries,
+                'db_ms': round(metrics.db_time * 1000, 2),
+                'serializer_ms': round(metrics.serializer_time * 1000, 2),
+            })
+        slow = elapsed_ms >= self.slow_request_ms
+        record['slow'] = slow
+        logger.log(logging.WARNING if slow else logging.DEBUG, json.dumps(record))
@@ -0,0 +1,19 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+
+class KeysetPagination(CursorPagination):
+    """Cursor pagination: every page is a ``WHERE <ordering field> < cursor LIMIT n`` query, with no OFFSET scans."""
+
+    ordering = '-id'
+    page_size = getattr(settings, 'API_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = getattr(settings, 'API_MAX_PAGE_SIZE', 500)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        # The cursor keys on the first field and steps through rows sharing its value by count,
+        # which only pages stably when those rows always come back in the same order.
+        if not {field.lstrip('-') for field in ordering} & {'id', 'pk'}:
+            ordering = (*ordering, '-id' if ordering[0].startswith('-') else 'id')
+        return ordering
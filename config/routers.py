@@ -0,0 +1,174 @@
+import hashlib
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Max
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_request = ContextVar('replica_request', default=None)
+_primary = ContextVar('replica_primary', default=False)
+
+# alias -> (checked_at, healthy); per process, refreshed every LAG_CHECK_INTERVAL seconds.
+_replica_health = {}
+
+
+def get_option(name, default):
+    return getattr(settings, 'REPLICA_ROUTING', {}).get(name, default)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+def pin_cache():
+    return caches[get_option('PIN_CACHE', 'replica_pins')]
+
+
+@contextmanager
+def use_primary():
+    """Read from the primary inside the block, e.g. to compute what goes into a shared cache.
+
+    A replica may trail the primary by up to MAX_LAG_SECONDS; cached from there, its rows
+    would outlive the invalidation the write already sent.
+    """
+    token = _primary.set(True)
+    try:
+        yield
+    finally:
+        _primary.reset(token)
+
+
+def replica_is_current(alias):
+    """True when ``alias`` trails the primary by at most MAX_LAG_SECONDS.
+
+    Lag is estimated from the newest ``updated_at`` of LAG_MODEL on both sides, which
+    an index answers without a scan; an idle primary always counts as caught up.
+    """
+    now = time.monotonic()
+    checked_at, healthy = _replica_health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < get_option('LAG_CHECK_INTERVAL', 1):
+        return healthy
+
+    model = apps.get_model(get_option('LAG_MODEL', 'booking.Booking'))
+    try:
+        primary = model.objects.using(DEFAULT_DB_ALIAS).aggregate(newest=Max('updated_at'))['newest']
+        replica = model.objects.using(alias).aggregate(newest=Max('updated_at'))['newest']
+    except Exception:
+        healthy = False
+    else:
+        healthy = primary is None or (
+            replica is not None and (primary - replica).total_seconds() <= get_option('MAX_LAG_SECONDS', 2)
+        )
+    _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+def client_key(request):
+    credentials = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return 'replica-pin:' + hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def reads_from_replica(request):
+    """Whether reads made while serving ``request`` may go to a replica.
+
+    Decided on the first read, once URL resolution has picked the view, and
+    remembered on the request.
+    """
+    allowed = getattr(request, '_reads_from_replica', None)
+    if allowed is None:
+        match = request.resolver_match
+        view = getattr(match.func, 'view_class', match.func) if match else None
+        allowed = (
+            request.method in SAFE_METHODS
+            and view is not None
+            and view.__module__.startswith(tuple(get_option('VIEW_MODULES', ('apps.booking.api', 'apps.account.api'))))
+            and not is_pinned(request)
+        )
+        request._reads_from_replica = allowed
+    return allowed
+
+
+def is_pinned(request):
+    key = client_key(request)
+    return key is not None and bool(pin_cache().get(key))
+
+
+class ReplicaRouter:
+    """Send reads to a replica while serving a request ReplicaRoutingMiddleware lets through.
+
+    Everything else (writes, management commands, other views) uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        request = _request.get()
+        if request is None or _primary.get() or not replica_aliases() or not reads_from_replica(request):
+            return None
+        healthy = [alias for alias in replica_aliases() if replica_is_current(alias)]
+        return random.choice(healthy) if healthy else DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaRoutingMiddleware:
+    """Let ReplicaRouter send safe reads of the views in REPLICA_ROUTING['VIEW_MODULES'] to replicas.
+
+    After a successful write a client is pinned to the primary for PIN_SECONDS,
+    so it reads its own writes even if the replica is behind. Pins live in the
+    PIN_CACHE alias, which every worker must share for the next request to see them.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        token = _request.set(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _request.reset(token)
+        key = self.pin_key(request, response)
+        if key is not None:
+            pin_cache().set(key, True, get_option('PIN_SECONDS', 5))
+        return response
+
+    async def __acall__(self, request):
+        token = _request.set(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _request.reset(token)
+        key = self.pin_key(request, response)
+        if key is not None:
+            await pin_cache().aset(key, True, get_option('PIN_SECONDS', 5))
+        return response
+
+    @staticmethod
+    def pin_key(request, response):
+        if request.method in SAFE_METHODS or response.status_code >= 400 or not replica_aliases():
+            return None
+        return client_key(request)
@@ -0,0 +1,92 @@
+"""
+OpenAPI schema generated once per process, or read from the artifact ``manage.py generate_schema`` writes.
+
+drf_yasg is only imported when the docs are first asked for, so workers that never
+serve them never load it.
+"""
+import hashlib
+import os
+from functools import lru_cache
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+_schema = None
+
+
+def info():
+    from drf_yasg import openapi
+
+    return openapi.Info(
+        title="Barber Booking API",
+        default_version='api',
+        description="Booking system for barber",
+        terms_of_service="https://www.google.com/policies/terms/",
+        contact=openapi.Contact(email="ibragimovxusanofficial@gmail.com"),
+        license=openapi.License(name="BSD License"),
+    )
+
+
+def generate():
+    """The schema as JSON bytes, the same for every host it is served from."""
+    from django.contrib.auth.models import AnonymousUser
+    from drf_yasg.codecs import OpenAPICodecJson
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.request import Request
+    from rest_framework.test import APIRequestFactory
+
+    # Views pick serializers from the request, so introspect them as an anonymous GET
+    # of the docs; what that request adds about its own host is dropped again.
+    request = Request(APIRequestFactory().get('/swagger/', {'format': 'openapi'}))
+    request.user = AnonymousUser()
+    schema = OpenAPISchemaGenerator(info()).get_schema(request=request, public=True)
+    schema.pop('host', None)
+    schema.pop('schemes', None)
+    return OpenAPICodecJson(validators=[]).encode(schema)
+
+
+def version(body):
+    return hashlib.sha256(body).hexdigest()[:16]
+
+
+def load():
+    """``(body, etag)``: the artifact when OPENAPI_SCHEMA_FILE exists, else a schema generated now."""
+    global _schema
+    if _schema is None:
+        path = getattr(settings, 'OPENAPI_SCHEMA_FILE', '')
+        if path and os.path.exists(path):
+            with open(path, 'rb') as artifact:
+                body = artifact.read()
+        else:
+            body = generate()
+        _schema = body, f'"{version(body)}"'
+    return _schema
+
+
+def schema_json(request):
+    body, etag = load()
+    response = get_conditional_response(request, etag=etag) or HttpResponse(body, content_type='application/json')
+    response['ETag'] = etag
+    response['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+@lru_cache(maxsize=None)
+def ui_view(renderer):
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    # The pages only embed settings; the UI fetches the spec itself from SPEC_URL.
+    view = get_schema_view(info(), public=True, permission_classes=[permissions.AllowAny])
+    return view.with_ui(renderer, cache_timeout=0)
+
+
+def ui(renderer):
+    """A Swagger UI / ReDoc page view that only imports drf_yasg once it is requested."""
+    def view(request, *args, **kwargs):
+        if request.GET.get('format') in ('openapi', 'json'):
+            # Where drf_yasg served the spec before /openapi.json; clients still fetch it there.
+            return schema_json(request)
+        return ui_view(renderer)(request, *args, **kwargs)
+    return view
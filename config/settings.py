@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
+import tempfile
+from importlib.util import find_spec
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -34,7 +37,8 @@ CORS_ORIGIN_ALLOW_ALL = True
 # Application definition
 
 INSTALLED_APPS = [
-    'django.contrib.admin',
+    # No autodiscover at boot: config.admin_urls registers the ModelAdmins on the first /admin/ request.
+    'django.contrib.admin.apps.SimpleAdminConfig',
     'django.contrib.auth',
     'django.contrib.contenttypes',
     'django.contrib.sessions',
@@ -45,15 +49,20 @@ INSTALLED_APPS = [
     'rest_framework_simplejwt',
     'rest_framework',
     'corsheaders',
-    'drf_yasg',
+    # Not 'drf_yasg': the app import alone loads pkg_resources, ~50 ms of every worker boot
+    # (manage.py profile_startup). config.schema imports it on demand; templates and static
+    # files come from DRF_YASG_DIR.
 
     # local app(s)
+    'config.apps.ConfigConfig',
     "apps.account",
     "apps.booking",
     "apps.blog",
 ]
 
 MIDDLEWARE = [
+    'config.middleware.InstrumentationMiddleware',
+    'config.routers.ReplicaRoutingMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -68,10 +77,13 @@ AUTH_USER_MODEL = 'account.User'
 
 ROOT_URLCONF = 'config.urls'
 
+# Located without importing the package.
+DRF_YASG_DIR = Path(find_spec('drf_yasg').submodule_search_locations[0])
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates'],
+        'DIRS': [BASE_DIR / 'templates', DRF_YASG_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -92,7 +104,8 @@ REST_FRAMEWORK = {
         # 'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # JWTAuthentication with the user row served from cache, see AUTH_USER_CACHE_*.
+        'apps.account.authentication.CachedJWTAuthentication',
         'rest_framework.authentication.SessionAuthentication',
         'rest_framework.authentication.BasicAuthentication'
     ),
@@ -102,6 +115,10 @@ REST_FRAMEWORK = {
     ]
 }
 
+# cursor pagination (config.pagination.KeysetPagination) ->
+API_PAGE_SIZE = int(os.environ.get('API_PAGE_SIZE', 50))
+API_MAX_PAGE_SIZE = int(os.environ.get('API_MAX_PAGE_SIZE', 500))
+
 # swagger ->
 SWAGGER_SETTINGS = {
     'SECURITY_DEFINITIONS': {
@@ -110,7 +127,45 @@ SWAGGER_SETTINGS = {
             'name': 'Authorization',
             'in': 'header'
         }
-    }
+    },
+    # Swagger UI and ReDoc fetch the cached schema of config.schema rather than regenerating it.
+    'SPEC_URL': 'schema-json',
+}
+REDOC_SETTINGS = {
+    'SPEC_URL': 'schema-json',
+}
+# Written by `manage.py generate_schema`; served as is when it exists, else generated on first use.
+OPENAPI_SCHEMA_FILE = os.environ.get('OPENAPI_SCHEMA_FILE', '')
+
+# request instrumentation (config.middleware.InstrumentationMiddleware) ->
+INSTRUMENTATION = {
+    # Fraction of requests that get query/serializer accounting; they are logged at DEBUG.
+    'SAMPLE_RATE': float(os.environ.get('INSTRUMENTATION_SAMPLE_RATE', 0.01)),
+    # Requests slower than this are logged at WARNING, sampled or not.
+    'SLOW_REQUEST_MS': float(os.environ.get('INSTRUMENTATION_SLOW_REQUEST_MS', 1000)),
+    # Server-Timing headers on sampled responses tell any client how long the database took; opt in.
+    'SERVER_TIMING': os.environ.get('INSTRUMENTATION_SERVER_TIMING', '0') == '1',
+}
+
+# Worker boot time (import of config.wsgi) allowed by `manage.py profile_startup` and the startup test.
+STARTUP_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 1500))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        # DEBUG also shows the sampled requests that were not slow.
+        'config.instrumentation': {
+            'handlers': ['console'],
+            'level': os.environ.get('INSTRUMENTATION_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
 }
 
 # cors headers ->
@@ -130,9 +185,105 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # A file rather than the in-memory default: concurrency tests write from several
+        # threads, and shared-cache memory databases fail at once instead of waiting for the lock.
+        # One per test process, so parallel runs and other checkouts never share it.
+        'TEST': {'NAME': os.path.join(tempfile.gettempdir(), f'booking-test-{os.getpid()}.sqlite3')},
     }
 }
 
+# Read replicas: DATABASE_REPLICAS is a comma separated list of SQLite files opened
+# read-only as replica_0, replica_1, ... (`manage.py sync_replicas` refreshes them
+# from the primary). config.routers.ReplicaRouter sends safe reads of the API views
+# there; everything else stays on the primary.
+for index, replica in enumerate(filter(None, os.environ.get('DATABASE_REPLICAS', '').split(','))):
+    DATABASES[f'replica_{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f'file:{Path(replica).resolve()}?mode=ro',
+        'OPTIONS': {'uri': True},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['config.routers.ReplicaRouter']
+
+# Run on every new SQLite connection (config.db.apply_sqlite_pragmas); see config/settings_production.py.
+SQLITE_PRAGMAS = {}
+
+REPLICA_ROUTING = {
+    'VIEW_MODULES': ['apps.booking.api', 'apps.account.api'],
+    # A client that just wrote reads from the primary for this long. The pins are kept in
+    # this cache alias, which has to be shared by every worker.
+    'PIN_SECONDS': int(os.environ.get('REPLICA_PIN_SECONDS', 5)),
+    'PIN_CACHE': 'replica_pins',
+    # Replicas further behind than this are skipped; lag is re-checked at most once per interval.
+    'MAX_LAG_SECONDS': float(os.environ.get('REPLICA_MAX_LAG_SECONDS', 2)),
+    'LAG_CHECK_INTERVAL': float(os.environ.get('REPLICA_LAG_CHECK_INTERVAL', 1)),
+    'LAG_MODEL': 'booking.Booking',
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Availability defaults to a per-process local-memory cache. Point it at a shared
+# backend (e.g. AVAILABILITY_CACHE_BACKEND=django.core.cache.backends.filebased.FileBasedCache
+# with AVAILABILITY_CACHE_LOCATION=/var/tmp/booking-availability) so every worker sees
+# the same entries and invalidations. Invalidations only reach the worker that made the
+# change otherwise, so entries are kept for minutes, not for the day.
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    },
+    'availability': {
+        'BACKEND': os.environ.get('AVAILABILITY_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('AVAILABILITY_CACHE_LOCATION', 'availability'),
+        'TIMEOUT': int(os.environ.get('AVAILABILITY_CACHE_TIMEOUT', 60 * 5)),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('AVAILABILITY_CACHE_MAX_ENTRIES', 50000)),
+        },
+    },
+    # Read-your-writes pins of config.routers; files are shared by the workers of a host.
+    'replica_pins': {
+        'BACKEND': os.environ.get('REPLICA_PIN_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('REPLICA_PIN_CACHE_LOCATION',
+                                   os.path.join(tempfile.gettempdir(), 'booking-replica-pins')),
+    },
+}
+
+AVAILABILITY_CACHE_ALIAS = 'availability'
+
+# Bookings that ended more than this many days ago are moved to BookingArchive by
+# `manage.py archive_bookings` (run it from cron); GET Bookings/?archived=1 reads them.
+BOOKING_ARCHIVE_AFTER_DAYS = int(os.environ.get('BOOKING_ARCHIVE_AFTER_DAYS', 30))
+
+# Server-Sent Event availability streams (apps.booking.broker) ->
+AVAILABILITY_STREAM = {
+    # Comment lines sent on an idle stream.
+    'KEEPALIVE_SECONDS': int(os.environ.get('AVAILABILITY_STREAM_KEEPALIVE_SECONDS', 15)),
+    # Watched days are re-read this often to pick up writes made by other processes.
+    'RESYNC_SECONDS': int(os.environ.get('AVAILABILITY_STREAM_RESYNC_SECONDS', 10)),
+    # Streams end after this long; EventSource reconnects by itself.
+    'MAX_SECONDS': int(os.environ.get('AVAILABILITY_STREAM_MAX_SECONDS', 600)),
+    # Undelivered events per client before it is sent a fresh snapshot instead.
+    'QUEUE_SIZE': 100,
+}
+
+# Per-barber iCalendar feeds (apps.booking.calendar), cached in the availability cache ->
+CALENDAR_FEED = {
+    'PAST_DAYS': int(os.environ.get('CALENDAR_FEED_PAST_DAYS', 14)),
+    'FUTURE_DAYS': int(os.environ.get('CALENDAR_FEED_FUTURE_DAYS', 180)),
+    # Poll interval suggested to calendar apps.
+    'REFRESH_MINUTES': 15,
+    'CACHE_TIMEOUT': 60 * 60 * 24,
+}
+
+# Users resolved by apps.account.authentication.CachedJWTAuthentication. Invalidation on
+# save only reaches other workers through a shared CACHE_BACKEND; otherwise entries
+# live at most this many seconds.
+AUTH_USER_CACHE_ALIAS = 'default'
+AUTH_USER_CACHE_TIMEOUT = int(os.environ.get('AUTH_USER_CACHE_TIMEOUT', 60))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -173,9 +324,20 @@ STATIC_URL = 'static/'
 STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 STATICFILES_DIRS = [
-    BASE_DIR / 'static'
+    BASE_DIR / 'static',
+    DRF_YASG_DIR / 'static',
 ]
 
+# avatar variants (apps.account.avatars) ->
+AVATAR_PROCESSING = {
+    'WORKERS': int(os.environ.get('AVATAR_WORKERS', 2)),
+    # Process in the calling thread right after commit instead of the worker pool.
+    'SYNC': os.environ.get('AVATAR_SYNC', '0') == '1',
+    'FORMAT': 'WEBP',
+    'QUALITY': 80,
+    'VARIANTS': {'thumb': 64, 'small': 160, 'medium': 320},
+}
+
 MEDIA_URL = '/media/'
     
 MEDIA_ROOT = BASE_DIR / 'media'
@@ -0,0 +1,52 @@
+"""
+Production profile: DJANGO_SETTINGS_MODULE=config.settings_production.
+
+Everything comes from config.settings; the database connection is tuned through
+environment variables:
+
+    DB_ENGINE / DB_NAME / DB_USER / DB_PASSWORD / DB_HOST / DB_PORT
+    DB_CONN_MAX_AGE         seconds a connection is reused across requests (0 = per request);
+                            keep 0 under ASGI, where the ORM runs in per-request threads
+    DB_CONN_HEALTH_CHECKS   ping reused connections before handing them out (1/0)
+    SQLITE_BUSY_TIMEOUT     seconds a SQLite writer waits for the lock before "database is locked"
+    SQLITE_JOURNAL_MODE     WAL lets readers run alongside the single writer
+    SQLITE_SYNCHRONOUS      NORMAL is durable across crashes of the process under WAL
+    SQLITE_CACHE_SIZE       page cache per connection, negative values are KiB
+
+The OpenAPI schema is read from OPENAPI_SCHEMA_FILE (default openapi.json next to
+manage.py); write it at deploy time with `manage.py generate_schema`.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, SECRET_KEY
+
+DEBUG = os.environ.get('DJANGO_DEBUG', '0') == '1'
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+ALLOWED_HOSTS = os.environ.get('DJANGO_ALLOWED_HOSTS', '*').split(',')
+OPENAPI_SCHEMA_FILE = os.environ.get('OPENAPI_SCHEMA_FILE', str(BASE_DIR / 'openapi.json'))
+
+DATABASES['default'].update({
+    'ENGINE': os.environ.get('DB_ENGINE', DATABASES['default']['ENGINE']),
+    'NAME': os.environ.get('DB_NAME', DATABASES['default']['NAME']),
+    'USER': os.environ.get('DB_USER', ''),
+    'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+    'HOST': os.environ.get('DB_HOST', ''),
+    'PORT': os.environ.get('DB_PORT', ''),
+})
+
+for database in DATABASES.values():
+    # Persistent connections: each worker thread keeps its connection for CONN_MAX_AGE
+    # seconds instead of reconnecting on every request. For a server-side pool put
+    # pgbouncer (transaction mode) in front of PostgreSQL and keep this at 0.
+    database['CONN_MAX_AGE'] = int(os.environ.get('DB_CONN_MAX_AGE', 60))
+    database['CONN_HEALTH_CHECKS'] = os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1'
+    if database['ENGINE'] == 'django.db.backends.sqlite3':
+        database.setdefault('OPTIONS', {})['timeout'] = float(os.environ.get('SQLITE_BUSY_TIMEOUT', 20))
+
+SQLITE_PRAGMAS = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -20000)),
+    'temp_store': 'MEMORY',
+}
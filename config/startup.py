@@ -0,0 +1,96 @@
+"""
+Worker startup profiling, used by ``manage.py profile_startup`` and the startup tests.
+
+The entry point is imported in a fresh interpreter under ``-X importtime``, with every
+AppConfig's module import, models import and ready() timed, so the numbers are those
+of a worker booting and not of the process asking.
+"""
+import json
+import os
+import re
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+
+# Runs in the child interpreter; prints the phase timings as JSON on its last stdout line.
+SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from django.apps.config import AppConfig
+
+apps = {}
+create = AppConfig.create.__func__
+
+
+def timed(label, phase, function):
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            apps.setdefault(label, {})[phase] = (time.perf_counter() - start) * 1000
+    return wrapper
+
+
+def create_timed(cls, entry):
+    start = time.perf_counter()
+    config = create(cls, entry)
+    apps.setdefault(config.label, {})['import'] = (time.perf_counter() - start) * 1000
+    config.import_models = timed(config.label, 'models', config.import_models)
+    config.ready = timed(config.label, 'ready', config.ready)
+    return config
+
+
+AppConfig.create = classmethod(create_timed)
+__import__(sys.argv[1])
+booted = time.perf_counter()
+boot_modules = sorted(sys.modules)
+# The URLconf is imported by the first request rather than at boot; time it on its own.
+sys.stderr.write(sys.argv[2] + '\\n')
+from django.urls import get_resolver
+get_resolver().url_patterns
+print(json.dumps({
+    'boot_ms': (booted - started) * 1000,
+    'urls_ms': (time.perf_counter() - booted) * 1000,
+    'apps': apps,
+    'boot_modules': boot_modules,
+    'url_modules': sorted(set(sys.modules) - set(boot_modules)),
+}))
+'''
+
+URLS_MARKER = '-- urls --'
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def profile(module='config.wsgi', settings_module=None):
+    """Boot ``module`` in a child interpreter, then load the URLconf as the first request would.
+
+    Returns ``boot_ms``, ``urls_ms``, per-app ``apps`` timings (import / models / ready, in ms),
+    the ``boot_modules`` and ``url_modules`` loaded by each step, and ``boot_imports`` /
+    ``url_imports`` as ``(name, self_us, cumulative_us, depth)`` rows in import order.
+    """
+    env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings_module or os.environ.get(
+        'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+    args = [sys.executable, '-X', 'importtime', '-c', SCRIPT, module, URLS_MARKER]
+    completed = subprocess.run(args, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+    if completed.returncode:
+        raise RuntimeError(f'Importing {module} failed:\n{completed.stderr[-2000:]}')
+
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    boot, _, urls = completed.stderr.partition(URLS_MARKER)
+    for phase, output in (('boot', boot), ('url', urls)):
+        result[f'{phase}_imports'] = [
+            (match.group(4), int(match.group(1)), int(match.group(2)), len(match.group(3)) // 2)
+            for match in map(IMPORT_LINE.match, output.splitlines()) if match
+        ]
+    return result
+
+
+def packages(imports):
+    """Import time in ms per top-level package, from the self time of each of its modules."""
+    totals = Counter()
+    for name, self_us, _, _ in imports:
+        totals[name.partition('.')[0]] += self_us / 1000
+    return totals
@@ -14,33 +14,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-from django.contrib import admin
-from django.urls import path, include
+from django.urls import URLResolver, path, include
+from django.urls.resolvers import RoutePattern
 from django.conf import settings
 from django.conf.urls.static import static
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView, TokenVerifyView
 
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Barber Booking API",
-        default_version='api',
-        description="Booking system for barber",
-        terms_of_service="https://www.google.com/policies/terms/",
-        contact=openapi.Contact(email="ibragimovxusanofficial@gmail.com"),
-        license=openapi.License(name="BSD License"),
-    ),
-    public=True,
-    permission_classes=[permissions.AllowAny],
-)
+from config import schema
 
 
 urlpatterns = [
-    # swagger
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('doc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc'),
+    # swagger: the spec is generated once per process (or read from manage.py generate_schema's file)
+    path('openapi.json', schema.schema_json, name='schema-json'),
+    path('swagger/', schema.ui('swagger'), name='schema-swagger-ui'),
+    path('doc/', schema.ui('redoc'), name='schema-redoc'),
 
     # tokens
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
@@ -48,7 +35,9 @@ urlpatterns = [
     path('api/token/verify/', TokenVerifyView.as_view(), name='token_verify'),
 
     # apis
-    path('admin/', admin.site.urls),
+    # config.admin_urls is imported by the first /admin/ request or reverse() call, not with this module:
+    # resolving API paths never reaches it.
+    URLResolver(RoutePattern('admin/'), 'config.admin_urls', app_name='admin', namespace='admin'),
     path('api/v1/', include('apps.booking.api.urls')),
     path('api/v1/', include('apps.account.api.urls')),
 